@@ -9,17 +9,29 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-from .routing import websocket_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'PriceLess.settings')
 
+# Set up Django before importing anything that loads models (the websocket consumers)
+django_asgi_application = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from .routing import websocket_urlpatterns  # noqa: E402
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_application,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             websocket_urlpatterns
         )
     ),
 })
+
+# Build the in-memory autocomplete index and read the catalog version while the
+# worker starts serving, then follow catalog reloads (needs the apps loaded above)
+from users import autocomplete, catalog_version, invalidation  # noqa: E402
+
+autocomplete.warm_up()
+catalog_version.warm_up()
+invalidation.listen()
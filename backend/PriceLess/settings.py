@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'users',
@@ -47,11 +48,30 @@ INSTALLED_APPS = [
 ]
 
 ASGI_APPLICATION = 'PriceLess.asgi.application'
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379')
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            "hosts": [('127.0.0.1', 6379)],
+            "hosts": [REDIS_URL],
+        },
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Catalog responses shared by all workers and nodes (users/response_cache.py),
+    # in their own database of the channel layer's Redis
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f"{REDIS_URL}/1",
+        'KEY_PREFIX': 'priceless',
+        'OPTIONS': {
+            # An unreachable Redis costs a request at most this long before it is served uncached
+            'socket_connect_timeout': 0.2,
+            'socket_timeout': 0.2,
         },
     },
 }
@@ -62,6 +82,37 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Keyset pagination of the product catalog endpoints
+CATALOG_PAGE_SIZE = int(os.environ.get('CATALOG_PAGE_SIZE', 100))
+CATALOG_MAX_PAGE_SIZE = int(os.environ.get('CATALOG_MAX_PAGE_SIZE', 500))
+# Rows fetched per server-side cursor round trip by /api/products/?stream=1
+CATALOG_STREAM_CHUNK_SIZE = int(os.environ.get('CATALOG_STREAM_CHUNK_SIZE', 2000))
+# Minimum pg_trgm word similarity for /api/search/?mode=fuzzy (0-1, higher is stricter)
+SEARCH_FUZZY_THRESHOLD = float(os.environ.get('SEARCH_FUZZY_THRESHOLD', 0.6))
+# Seconds between checks for a reloaded catalog by the in-memory autocomplete index
+AUTOCOMPLETE_CHECK_INTERVAL = int(os.environ.get('AUTOCOMPLETE_CHECK_INTERVAL', 60))
+# Threads (each with its own database connection) that run search and catalog queries
+# of the async catalog views side by side; 0 runs them on the shared sync thread
+CATALOG_QUERY_WORKERS = int(os.environ.get('CATALOG_QUERY_WORKERS', 4))
+# Seconds a worker may keep validating catalog responses (ETag / 304) against the
+# catalog version it last read, before noticing a reload by another process
+CATALOG_VERSION_CHECK_INTERVAL = int(os.environ.get('CATALOG_VERSION_CHECK_INTERVAL', 5))
+# Seconds after a load that the previous load's home page snapshots are still served,
+# while refresh_catalog matches the products and renders the new ones
+CATALOG_SNAPSHOT_MAX_LAG = int(os.environ.get('CATALOG_SNAPSHOT_MAX_LAG', 900))
+# Seconds each catalog endpoint's responses stay in the shared cache. A load
+# invalidates them all at once (they are keyed by catalog version), so these
+# only bound how long unused responses take up memory in Redis
+CATALOG_CACHE_TIMEOUTS = {
+    'products': 3600,
+    'filtered-products': 3600,
+    'cheapest-products-per-category': 6 * 3600,
+    'deals': 6 * 3600,
+    'search': 600,
+}
+# Bytes of catalog responses each worker also keeps in memory, least recently used evicted first
+CATALOG_LOCAL_CACHE_BYTES = int(os.environ.get('CATALOG_LOCAL_CACHE_BYTES', 64 * 1024 * 1024))
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'PriceLess.settings')
 
 application = get_wsgi_application()
+
+# Build the in-memory autocomplete index and read the catalog version while the
+# worker starts serving, then follow catalog reloads (needs the apps loaded above)
+from users import autocomplete, catalog_version, invalidation  # noqa: E402
+
+autocomplete.warm_up()
+catalog_version.warm_up()
+invalidation.listen()
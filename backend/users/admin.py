@@ -1,8 +1,17 @@
 from django.contrib import admin
-from .models import Product
+from .models import Category, MarketCategory, Product
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('main_category', 'sub_category', 'lowest_category', 'name', 'price', 'high_price', 'in_stock', 'product_link', 'image_url', 'page_link', 'date','market_name' )  # Admin panelindeki sütunlar
 
 
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('key', 'name')
+
+
+@admin.register(MarketCategory)
+class MarketCategoryAdmin(admin.ModelAdmin):
+    list_display = ('market', 'name', 'category')
+    list_filter = ('market', 'category')
@@ -0,0 +1,182 @@
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Min
+
+from .models import CatalogProduct
+from .text import turkish_casefold
+
+logger = logging.getLogger(__name__)
+
+# Sorts after every character a key can continue with, so bisecting for
+# prefix + PREFIX_END finds the end of the keys starting with prefix.
+PREFIX_END = '\U0010ffff'
+
+# Prefix ranges up to this many keys are ranked at lookup time; the top
+# completions of larger ranges are computed when the index is built.
+SCAN_LIMIT = 2000
+
+# Most completions a lookup can return
+MAX_COMPLETIONS = 20
+
+
+def fold(text):
+    """Lookup form of a name or query: Turkish casefolded, single-spaced."""
+    return ' '.join(turkish_casefold(text).split())
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over product names.
+
+    Every name is indexed from the start of each of its words, so "süt"
+    completes "Pınar Süt 1 L" as well as "Süt Kreması". The keys of a
+    prefix form one contiguous range of the sorted array, found by bisect.
+
+    Completions are numbered in rank order (most products carrying the
+    name first, then cheapest), so the best completions of a range are its
+    smallest completion numbers. Ranges too large to rank per keystroke
+    have their top completions precomputed.
+    """
+
+    def __init__(self, completions):
+        # completions: (name, price, product count), best first
+        self.completions = completions
+        keyed = sorted(
+            (' '.join(words[start:]), number)
+            for number, (name, _, _) in enumerate(completions)
+            for words in [fold(name).split()]
+            for start in range(len(words))
+        )
+        self.keys = [key for key, _ in keyed]
+        self.numbers = [number for _, number in keyed]
+        self.top = {}
+        self._precompute_top()
+
+    def __len__(self):
+        return len(self.completions)
+
+    def _best(self, lo, hi, k):
+        return heapq.nsmallest(k, set(self.numbers[lo:hi]))
+
+    def _precompute_top(self, prefix='', lo=0, hi=None):
+        """Store the top completions of every prefix whose range exceeds SCAN_LIMIT.
+
+        Walks the prefixes one character at a time and stops wherever a
+        range is small enough to rank at lookup; a prefix's top completions
+        are merged from those of the prefixes one character longer, so every
+        key is ranked only once. Returns the top completions of `prefix`.
+        """
+        if hi is None:
+            hi = len(self.keys)
+        if hi - lo <= SCAN_LIMIT:
+            return self._best(lo, hi, MAX_COMPLETIONS)
+        # Keys equal to the prefix sort first and have no next character
+        start = bisect_right(self.keys, prefix, lo, hi)
+        candidates = set(self.numbers[lo:start])
+        while start < hi:
+            longer = prefix + self.keys[start][len(prefix)]
+            end = bisect_left(self.keys, longer + PREFIX_END, start, hi)
+            candidates.update(self._precompute_top(longer, start, end))
+            start = end
+        self.top[prefix] = heapq.nsmallest(MAX_COMPLETIONS, candidates)
+        return self.top[prefix]
+
+    def complete(self, query, k=10):
+        """The k best completions of `query`, as (name, price, product count)."""
+        prefix = fold(query)
+        if not prefix:
+            return []
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + PREFIX_END, lo)
+        if hi - lo > SCAN_LIMIT:
+            numbers = self.top[prefix][:k]
+        else:
+            numbers = self._best(lo, hi, k)
+        return [self.completions[number] for number in numbers]
+
+
+def catalog_generation():
+    """Changes whenever the catalog is reloaded: refresh_catalog draws new ids from this sequence."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT last_value FROM catalog_products_id_seq")
+        return cursor.fetchone()[0]
+
+
+def build_index():
+    """Build a PrefixIndex from the priced catalog products, one completion per distinct name."""
+    completions = [
+        (row['name'], row['price'], row['products'])
+        for row in CatalogProduct.objects.priced()
+        .values('name')
+        .annotate(products=Count('id'), price=Min('price'))
+        .order_by('-products', 'price', 'name')
+        .iterator(chunk_size=settings.CATALOG_STREAM_CHUNK_SIZE)
+    ]
+    return PrefixIndex(completions)
+
+
+_index = None
+_generation = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def rebuild():
+    """Build the index from the catalog now and make it the one lookups use."""
+    global _index, _generation
+    with _lock:
+        started = time.perf_counter()
+        generation = catalog_generation()
+        _index = build_index()
+        _generation = generation
+        logger.info(
+            f"Autocomplete index built with {len(_index)} names in {time.perf_counter() - started:.1f}s"
+        )
+    return _index
+
+
+def _refresh_if_changed():
+    try:
+        if catalog_generation() != _generation:
+            rebuild()
+    except Exception:
+        logger.exception("Autocomplete index rebuild failed")
+    finally:
+        connection.close()
+
+
+def warm_up():
+    """Build the index in the background; called once per worker at start."""
+    threading.Thread(target=_refresh_if_changed, name='autocomplete-warm-up', daemon=True).start()
+
+
+def refresh_in_background():
+    """Rebuild the index in a background thread if the catalog was reloaded, unless a build is under way."""
+    global _checked_at
+    if not _lock.locked():
+        _checked_at = time.monotonic()
+        threading.Thread(target=_refresh_if_changed, name='autocomplete-refresh', daemon=True).start()
+
+
+def get_index():
+    """The current index, without touching the database unless none has been built yet.
+
+    A reload (by refresh_catalog, in another process) is announced over
+    Redis (see invalidation.py) and a background thread then swaps in a
+    rebuilt index; lookups keep using the previous one meanwhile. Should
+    the announcement be lost, the catalog is checked at least once every
+    AUTOCOMPLETE_CHECK_INTERVAL seconds.
+    """
+    if _index is None:
+        with _lock:
+            pass  # let a warm-up build that is under way finish first
+        if _index is None:
+            return rebuild()
+    if time.monotonic() - _checked_at > settings.AUTOCOMPLETE_CHECK_INTERVAL:
+        refresh_in_background()
+    return _index
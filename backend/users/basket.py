@@ -0,0 +1,137 @@
+from collections import Counter, defaultdict
+
+from django.db import connection
+
+from .models import MARKETS, CatalogProduct
+
+# Most items one basket comparison accepts
+MAX_BASKET_ITEMS = 200
+
+BASKET_FIELDS = ('canonical_product_id', 'market', 'source_id', 'name', 'price', 'image_url', 'main_category')
+
+
+class BasketError(ValueError):
+    """A basket comparison request that cannot be answered, e.g. an item without a product."""
+
+
+def parse_items(items):
+    """Validated (canonical_product_id, name, quantity) of every item of a request body.
+
+    An item names its product either by `canonical_product_id` (the
+    `canonical_product` of catalog products) or by `name`, as the cart
+    stores it; `quantity` defaults to 1.
+    """
+    if not isinstance(items, list) or not items:
+        raise BasketError('items must be a non-empty list')
+    if len(items) > MAX_BASKET_ITEMS:
+        raise BasketError(f'a basket holds at most {MAX_BASKET_ITEMS} items')
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise BasketError('every item must be an object')
+        canonical_product_id, name = item.get('canonical_product_id'), item.get('name')
+        quantity = item.get('quantity', 1)
+        if canonical_product_id is not None and not _is_integer(canonical_product_id):
+            raise BasketError('canonical_product_id must be an integer')
+        if canonical_product_id is None and (not isinstance(name, str) or not name.strip()):
+            raise BasketError('every item needs a canonical_product_id or a name')
+        if not _is_integer(quantity) or quantity < 1:
+            raise BasketError('quantity must be a positive integer')
+        parsed.append((canonical_product_id, name, quantity))
+    return parsed
+
+
+def _is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _search_names(names):
+    """The catalog_products.search_name form of each of `names` (lower case, no diacritics)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT catalog_search_name(btrim(name)) FROM unnest(%s::text[]) WITH ORDINALITY AS n(name, position) "
+            "ORDER BY position",
+            [names],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def compare_basket(items):
+    """Price a basket in every market: per market its total, the products found and whether all were.
+
+    `items` are parse_items() tuples. Each item is resolved to a canonical
+    product, so it is found in every market that sells the same product
+    under its own name; an item given by name takes the canonical product of
+    the catalog products with that name. Both lookups are index scans
+    (search_name and canonical_product_id indexes) reading only the basket's
+    rows. Names of products that are not matched across markets yet are
+    looked up by name in each market instead.
+
+    Markets are sorted complete baskets first, then by total.
+    """
+    names = sorted({name for canonical_product_id, name, _ in items if canonical_product_id is None})
+    keys = dict(zip(names, _search_names(names))) if names else {}
+
+    # name key -> the canonical products its catalog products belong to, and the unmatched products
+    canonical_votes = defaultdict(Counter)
+    unmatched = defaultdict(dict)
+    if keys:
+        products = CatalogProduct.objects.filter(search_name__in=set(keys.values()))
+        for product in products.values('search_name', *BASKET_FIELDS):
+            if product['canonical_product_id'] is not None:
+                canonical_votes[product['search_name']][product['canonical_product_id']] += 1
+            else:
+                cheapest = unmatched[product['search_name']].get(product['market'])
+                if cheapest is None or product['price'] < cheapest['price']:
+                    unmatched[product['search_name']][product['market']] = product
+
+    resolved = []
+    for canonical_product_id, name, quantity in items:
+        key = keys.get(name) if canonical_product_id is None else None
+        if canonical_product_id is None and canonical_votes[key]:
+            canonical_product_id = canonical_votes[key].most_common(1)[0][0]
+        resolved.append((canonical_product_id, key, name, quantity))
+
+    # canonical product -> market -> its product there
+    offers = defaultdict(dict)
+    canonical_ids = {canonical_product_id for canonical_product_id, _, _, _ in resolved} - {None}
+    if canonical_ids:
+        products = CatalogProduct.objects.filter(canonical_product_id__in=canonical_ids)
+        for product in products.values(*BASKET_FIELDS):
+            offers[product['canonical_product_id']][product['market']] = product
+
+    comparisons = []
+    for market, display_name, _ in MARKETS:
+        total_kurus = 0
+        available = []
+        for canonical_product_id, key, name, quantity in resolved:
+            if canonical_product_id is not None:
+                product = offers[canonical_product_id].get(market)
+            else:
+                product = unmatched[key].get(market)
+            if product is None:
+                continue
+            # Summed in kuruş so that totals are exact
+            total_kurus += round(product['price'] * 100) * quantity
+            available.append({
+                'canonical_product_id': product['canonical_product_id'],
+                'id': product['source_id'],
+                'name': name if name is not None else product['name'],
+                'market_product_name': product['name'],
+                'price': product['price'],
+                'quantity': quantity,
+                'image': product['image_url'],
+                'category': product['main_category'],
+            })
+        if available:
+            comparisons.append({
+                'market': market,
+                'marketName': display_name,
+                'totalPrice': total_kurus / 100,
+                'availableProducts': available,
+                'totalProducts': len(items),
+                'foundProducts': len(available),
+                'isComplete': len(available) == len(items),
+            })
+    comparisons.sort(key=lambda comparison: (not comparison['isComplete'], comparison['totalPrice']))
+    return comparisons
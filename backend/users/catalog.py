@@ -0,0 +1,284 @@
+import logging
+
+from django.db import connection, transaction
+
+from django.db.models import F
+from django.db.models.functions import Round
+
+from .catalog_version import bump_version
+from .categories import display_category
+from .models import MARKETS, CatalogProduct, Deal, MarketCategory
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration of search queries; catalog_search_vector() (migration 0016)
+# builds catalog_products.search_vector with the same one.
+SEARCH_CONFIG = 'turkish'
+
+
+def search_vector_sql(table):
+    """SQL computing the search vector of a `table` row: its name, ranked above its categories.
+
+    The catalog_products_search_vector trigger sets it on every insert and
+    on updates of these columns, so loads never need to compute it.
+    """
+    return (
+        f"catalog_search_vector({table}.name, {table}.main_category, "
+        f"{table}.sub_category, {table}.lowest_category)"
+    )
+
+
+# catalog_products column -> expression over the per-market table row `p`.
+# The per-market tables keep the loader's text layout; the catalog stores
+# prices in kuruş, stock as a boolean and the scrape date as a date
+# (catalog_parse_date, created by migration 0014, returns NULL for dates
+# it cannot read, such as Excel's "#########").
+CATALOG_COLUMNS = {
+    'main_category': 'p.main_category',
+    'sub_category': 'p.sub_category',
+    'lowest_category': 'p.lowest_category',
+    'name': 'p.name',
+    'price_kurus': 'round(p.price * 100)',
+    'high_price_kurus': 'round(p.high_price * 100)',
+    'in_stock': "lower(p.in_stock) IN ('true', '1')",
+    'product_link': 'p.product_link',
+    'page_link': 'p.page_link',
+    'image_url': 'p.image_url',
+    'date': 'catalog_parse_date(p.date)',
+}
+
+
+def partition_table(market):
+    return f"{CatalogProduct._meta.db_table}_{market}"
+
+
+def ensure_partitions(cursor):
+    """Create the catalog_products partition of every registered market."""
+    for market, _, _ in MARKETS:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {partition_table(market)} "
+            f"PARTITION OF {CatalogProduct._meta.db_table} FOR VALUES IN ('{market}')"
+        )
+
+
+def _select_columns(model_fields):
+    return ', '.join(
+        f'{connection.ops.quote_name(field.column)} AS {connection.ops.quote_name(field.attname)}'
+        for field in model_fields
+    )
+
+
+def _product_rows(rows, keys, fields, model_fields):
+    """Dicts of raw rows: the leading `keys` columns as they are, then `fields` with their conversions."""
+    # Raw SQL skips the fields' own conversions (kuruş to lira), so apply them here
+    products = []
+    for row in rows:
+        product = dict(zip(keys, row))
+        for name, field, value in zip(fields, model_fields, row[len(keys):]):
+            if hasattr(field, 'from_db_value'):
+                value = field.from_db_value(value, None, connection)
+            product[name] = value
+        products.append(product)
+    return products
+
+
+def cheapest_per_market(fields, limit=4):
+    """Returns the `limit` cheapest products of each market, grouped in MARKETS order.
+
+    A single query runs one LATERAL top-k per market, each of which reads
+    `limit` rows from catalog_products_market_price_id_idx (an index-only
+    scan when only indexed columns are requested), so the cost does not grow
+    with the size of the catalog.
+    """
+    model_fields = [CatalogProduct._meta.get_field(field) for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT m.market, p.*
+            FROM unnest(%s::text[]) WITH ORDINALITY AS m(market, position)
+            CROSS JOIN LATERAL (
+                SELECT {_select_columns(model_fields)}
+                FROM {CatalogProduct._meta.db_table}
+                WHERE market = m.market AND price_kurus IS NOT NULL
+                ORDER BY price_kurus, id
+                LIMIT %s
+            ) p
+            ORDER BY m.position, p.price
+            """,
+            [[market for market, _, _ in MARKETS], limit],
+        )
+        rows = cursor.fetchall()
+    return _product_rows(rows, ['market'], fields, model_fields)
+
+
+def cheapest_per_category(fields, k, main_category=None, mapped_only=False):
+    """Returns the k cheapest products of every (market, main_category) pair, with its market and main_category.
+
+    A single query runs one LATERAL top-k per pair, reading k rows from
+    catalog_products_market_category_price_idx, so the cost grows with the
+    number of categories rather than of products. The pairs are the markets
+    with `main_category` when it is given; with `mapped_only` those that
+    market_categories maps to a normalized category (whose products alone
+    are kept, as refresh_catalog set their category); otherwise every
+    main_category of each market, found by a skip scan of the same index.
+    """
+    model_fields = [CatalogProduct._meta.get_field(field) for field in fields]
+    table = CatalogProduct._meta.db_table
+    markets = [market for market, _, _ in MARKETS]
+    if main_category is not None:
+        pairs = "SELECT market, %s::text AS main_category FROM unnest(%s::text[]) AS m(market)"
+        params = [main_category, markets]
+    elif mapped_only:
+        pairs = f"SELECT market, name AS main_category FROM {MarketCategory._meta.db_table} WHERE market = ANY(%s)"
+        params = [markets]
+    else:
+        # Loose index scan: from each category of a market, one index probe finds the next
+        pairs = f"""
+            WITH RECURSIVE categories(market, main_category) AS (
+                SELECT m.market, first.main_category
+                FROM unnest(%s::text[]) AS m(market)
+                CROSS JOIN LATERAL (
+                    SELECT main_category FROM {table} WHERE market = m.market ORDER BY main_category LIMIT 1
+                ) first
+                UNION ALL
+                SELECT c.market, next.main_category
+                FROM categories c
+                CROSS JOIN LATERAL (
+                    SELECT main_category FROM {table}
+                    WHERE market = c.market AND main_category > c.main_category
+                    ORDER BY main_category LIMIT 1
+                ) next
+            )
+            SELECT market, main_category FROM categories
+        """
+        params = [markets]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT pairs.market, pairs.main_category, p.*
+            FROM ({pairs}) pairs
+            CROSS JOIN LATERAL (
+                SELECT {_select_columns(model_fields)}
+                FROM {table}
+                WHERE market = pairs.market AND main_category = pairs.main_category
+                    AND price_kurus IS NOT NULL {'AND category_id IS NOT NULL' if mapped_only else ''}
+                ORDER BY price_kurus, id
+                LIMIT %s
+            ) p
+            """,
+            params + [k],
+        )
+        rows = cursor.fetchall()
+    return _product_rows(rows, ['market', 'main_category'], fields, model_fields)
+
+
+def update_search_vectors(since=None, changed_only=False, batch_size=10000):
+    """Recompute catalog search vectors in id-range batches, each committed on its own.
+
+    The trigger keeps vectors current, so this is for rows it missed or for
+    after catalog_search_vector() changes. `since` limits the update to
+    products scraped on or after that date; `changed_only` skips rows whose
+    vector is already up to date, so they are neither rewritten nor bloated.
+    Returns the number of rows updated.
+    """
+    count = 0
+    with connection.cursor() as cursor:
+        for market, _, _ in MARKETS:
+            table = partition_table(market)
+            vector = search_vector_sql(table)
+            conditions = ['id >= %s', 'id < %s']
+            params = []
+            if since is not None:
+                conditions.append('date >= %s')
+                params.append(since)
+            if changed_only:
+                conditions.append(f'search_vector IS DISTINCT FROM {vector}')
+
+            cursor.execute(f"SELECT min(id), max(id) FROM {table}")
+            first, last = cursor.fetchone()
+            if first is None:
+                continue
+            for start in range(first, last + 1, batch_size):
+                cursor.execute(
+                    f"UPDATE {table} SET search_vector = {vector} WHERE {' AND '.join(conditions)}",
+                    [start, start + batch_size, *params],
+                )
+                count += cursor.rowcount
+            logger.info(f"Search vectors of {market} products updated")
+    return count
+
+
+def refresh_deals(cursor):
+    """Rebuild the deals table from the discounted products of catalog_products."""
+    discounted = CatalogProduct.objects.discounted().annotate(
+        category_label=display_category(),
+        discount_percentage=Round(F('discount_ratio') * 100),
+    ).values_list(
+        'market', 'source_id', 'name', 'price', 'high_price', 'image_url', 'product_link',
+        'main_category', 'sub_category', 'lowest_category',
+        'discount_ratio', 'category_label', 'discount_percentage',
+    )
+    compiler = discounted.query.get_compiler(connection=connection)
+    sql, params = compiler.as_sql()
+
+    # The INSERT's columns follow the SELECT's own order (fields before annotations, whatever
+    # the values_list order); annotations take the name of their deals field, except
+    # category_label, which cannot be called category on CatalogProduct
+    deal_fields = {'category_label': 'category'}
+    columns = []
+    for expression, _, alias in compiler.select:
+        name = alias if alias is not None else expression.target.name
+        columns.append(connection.ops.quote_name(Deal._meta.get_field(deal_fields.get(name, name)).column))
+    cursor.execute(f"DELETE FROM {Deal._meta.db_table}")
+    cursor.execute(f"INSERT INTO {Deal._meta.db_table} ({', '.join(columns)}) {sql}", params)
+    logger.info(f"Rebuilt the deals table with {cursor.rowcount} discounted products")
+    return cursor.rowcount
+
+
+def refresh_catalog():
+    """Reload catalog_products from the per-market tables, then rebuild deals.
+
+    Each product gets the normalized category its (market, main_category)
+    maps to in market_categories, so run it again after editing that table.
+    Products keep the canonical product match_products gave them in the
+    previous load (by market and source id), so canonical ids stay stable.
+
+    Everything runs in one transaction, which also bumps the catalog
+    version, so readers keep seeing the previous catalog (and its cached
+    responses stay valid) until the new one is committed. Returns row
+    counts per market.
+    """
+    columns = ', '.join(CATALOG_COLUMNS)
+    expressions = ', '.join(CATALOG_COLUMNS.values())
+    counts = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        ensure_partitions(cursor)
+        cursor.execute(
+            f"""
+            CREATE TEMPORARY TABLE previous_canonical_products ON COMMIT DROP AS
+            SELECT market, source_id, canonical_product_id
+            FROM {CatalogProduct._meta.db_table}
+            WHERE canonical_product_id IS NOT NULL
+            """
+        )
+        for market, _, model in MARKETS:
+            cursor.execute(f"DELETE FROM {partition_table(market)}")
+            cursor.execute(
+                f"""
+                INSERT INTO {CatalogProduct._meta.db_table} (market, source_id, category_id, canonical_product_id, {columns})
+                SELECT %s, p.id, mc.category_id, cp.canonical_product_id, {expressions}
+                FROM {model._meta.db_table} p
+                LEFT JOIN {MarketCategory._meta.db_table} mc ON mc.market = %s AND mc.name = p.main_category
+                LEFT JOIN previous_canonical_products cp ON cp.market = %s AND cp.source_id = p.id
+                """,
+                [market, market, market],
+            )
+            counts[market] = cursor.rowcount
+            logger.info(f"Loaded {cursor.rowcount} {market} products into the catalog")
+        refresh_deals(cursor)
+        bump_version()
+    # Refresh planner statistics and the visibility map, which index-only scans rely on
+    with connection.cursor() as cursor:
+        for table in (CatalogProduct._meta.db_table, Deal._meta.db_table):
+            cursor.execute(f"VACUUM (ANALYZE) {table}")
+    return counts
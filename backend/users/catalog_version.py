@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Now
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import CatalogVersion
+
+logger = logging.getLogger(__name__)
+
+
+def bump_version():
+    """Mark the catalog as changed; call it in the transaction that changes it."""
+    CatalogVersion.objects.update(version=F('version') + 1, loaded_at=Now())
+
+
+def read_version():
+    """(version, loaded_at) of the catalog, read from the database."""
+    return CatalogVersion.objects.values_list('version', 'loaded_at').get()
+
+
+_version = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def refresh():
+    """Read the catalog version now and make it the one get_version() returns."""
+    global _version, _checked_at
+    with _lock:
+        _checked_at = time.monotonic()
+        _version = read_version()
+    return _version
+
+
+def _refresh_in_background():
+    try:
+        refresh()
+    except Exception:
+        logger.exception("Catalog version check failed")
+    finally:
+        connection.close()
+
+
+def warm_up():
+    """Read the version in the background; called once per worker at start."""
+    threading.Thread(target=_refresh_in_background, name='catalog-version-warm-up', daemon=True).start()
+
+
+def refresh_in_background():
+    """Re-read the version in a background thread, unless a read is under way."""
+    global _checked_at
+    if not _lock.locked():
+        _checked_at = time.monotonic()
+        threading.Thread(target=_refresh_in_background, name='catalog-version-check', daemon=True).start()
+
+
+def get_version():
+    """The catalog version this process last read, as (version, loaded_at); None until the first read.
+
+    Never touches the database, so it can be called on every request and
+    from async code. A reload is announced to every worker over Redis
+    (see invalidation.py); should that message be lost, at most
+    CATALOG_VERSION_CHECK_INTERVAL seconds later a background thread
+    re-reads the version anyway.
+    """
+    if time.monotonic() - _checked_at > settings.CATALOG_VERSION_CHECK_INTERVAL:
+        refresh_in_background()
+    return _version
+
+
+def version_etag(version):
+    # Weak: one version's responses are equivalent, not guaranteed byte-identical
+    return f'W/"catalog-{version[0]}"'
+
+
+def catalog_etag(request, *args, **kwargs):
+    version = get_version()
+    return version_etag(version) if version else None
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    version = get_version()
+    return version[1] if version else None
+
+
+def catalog_conditional(view):
+    """Validate the responses of a read-only catalog view with the catalog version.
+
+    A request whose If-None-Match names the current version gets a 304
+    before `view` runs, without any database work; other responses carry
+    the version's ETag and Last-Modified. Wrap the outermost (async) view,
+    so that a 304 does not even wait for a query pool thread.
+    """
+    return cache_control(no_cache=True)(
+        condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)(view)
+    )
@@ -0,0 +1,27 @@
+from django.db.models import F, Q, TextField, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from .models import Category
+from .text import turkish_casefold
+
+
+def display_category():
+    """Normalized category label, falling back to the market's own category or "Genel"."""
+    return Coalesce(
+        F('category__name'), NullIf('main_category', Value('')), Value('Genel'),
+        output_field=TextField(),
+    )
+
+
+def category_filter(category):
+    """Q for an indexed category lookup.
+
+    A normalized category key or label (compared with Turkish casefolding)
+    becomes a category_id equality; anything else is matched exactly against
+    the market's own main_category.
+    """
+    folded = turkish_casefold(category.strip())
+    for category_id, key, name in Category.objects.values_list('id', 'key', 'name'):
+        if folded in (key, turkish_casefold(name)):
+            return Q(category_id=category_id)
+    return Q(main_category=category)
@@ -0,0 +1,90 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+
+_executor = None
+_executor_workers = None
+_executor_lock = threading.Lock()
+
+
+def query_pool():
+    """The bounded thread pool catalog queries run on, created on first use.
+
+    Sized by CATALOG_QUERY_WORKERS, and replaced when that setting changes
+    (benchmark_concurrency compares pool sizes in one process).
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor_workers != settings.CATALOG_QUERY_WORKERS:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CATALOG_QUERY_WORKERS, thread_name_prefix='catalog-query'
+            )
+            _executor_workers = settings.CATALOG_QUERY_WORKERS
+    return _executor
+
+
+def _run_with_connection(func, *args, **kwargs):
+    # Each pool thread keeps its own database connection. Like the request
+    # cycle does, drop it when it is broken or older than CONN_MAX_AGE.
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_query_pool(func, *args, **kwargs):
+    """Run the blocking `func` on the catalog query pool and await its result.
+
+    Under ASGI, sync views and thread-sensitive async ORM calls all share
+    one thread per worker, so a slow search queues every other request
+    behind it. Pool threads run queries side by side, each on its own
+    connection. With CATALOG_QUERY_WORKERS = 0, `func` runs on that shared
+    thread as before (tests need this: only the shared thread's connection
+    sees the test transaction).
+    """
+    if not settings.CATALOG_QUERY_WORKERS:
+        return await sync_to_async(func)(*args, **kwargs)
+    return await sync_to_async(
+        _run_with_connection, thread_sensitive=False, executor=query_pool()
+    )(func, *args, **kwargs)
+
+
+def submit_to_query_pool(func, *args, **kwargs):
+    """Start the blocking `func` on the catalog query pool without waiting for it (needs CATALOG_QUERY_WORKERS > 0)."""
+    return query_pool().submit(_run_with_connection, func, *args, **kwargs)
+
+
+async def _iterate_in_sync_thread(iterator):
+    # Every chunk is read by the same thread: a server-side cursor (QuerySet.iterator)
+    # belongs to the connection of the thread that opened it, so chunks cannot be
+    # spread over the pool threads, which each have their own
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while (chunk := await next_chunk(iterator, done)) is not done:
+        yield chunk
+
+
+def query_pool_view(view):
+    """Serve a sync view as an async view whose work runs on the catalog query pool.
+
+    Served over ASGI, a streaming response's (sync) iterator is handed to
+    the server as an async one that reads a chunk at a time on the
+    request's sync thread: Django would otherwise read it whole into
+    memory before sending the first byte. A WSGI server iterates the sync
+    one as it is, which an async iterator would make it read whole too.
+    """
+    @functools.wraps(view)
+    async def pooled_view(request, *args, **kwargs):
+        response = await run_in_query_pool(view, request, *args, **kwargs)
+        if response.streaming and not response.is_async and isinstance(request, ASGIRequest):
+            response.streaming_content = _iterate_in_sync_thread(response.streaming_content)
+        return response
+    return pooled_view
@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class KurusField(models.IntegerField):
+    """A price stored as integer kuruş and handled in Python as lira.
+
+    Four bytes per value instead of a double, and exact: 12.99 is stored as
+    1299. Lookups, ordering and aggregates work on the integer column; values
+    read through the ORM and values passed to filters are in lira.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return value / 100
+
+    def to_python(self, value):
+        if value is None or isinstance(value, float):
+            return value
+        return float(value)
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return value
+        return round(float(value) * 100)
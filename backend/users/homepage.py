@@ -0,0 +1,117 @@
+"""The home screen's catalog responses, rendered into catalog_snapshots after each load.
+
+The views answer from the snapshot of the current catalog version and
+only query the catalog (with the same functions) while there is none.
+"""
+import logging
+import time
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Round
+
+from .catalog import cheapest_per_category, cheapest_per_market
+from .catalog_version import read_version
+from .categories import display_category
+from .models import MARKETS, CatalogProduct, CatalogSnapshot, Category
+from .responses import SerializedBody, SnapshotResponse
+from .serializers import DiscountedProductSerializer
+
+logger = logging.getLogger(__name__)
+
+# Products listed by /api/discounted-products/ without ?limit=, the request the snapshot answers
+DISCOUNTED_PRODUCTS_LIMIT = 50
+
+
+def cheapest_products():
+    """The 4 cheapest products of each market."""
+    return [
+        {
+            "name": product['name'],
+            "price": product['price'],
+            "image": product['image_url'],
+            "market_name": product['market']
+        }
+        for product in cheapest_per_market(['name', 'price', 'image_url'])
+    ]
+
+
+def cheapest_products_by_categories():
+    """The 4 cheapest products of each market in each normalized category."""
+    # Products whose market category maps to a normalized category
+    products = cheapest_per_category(['category_id', 'name', 'price', 'image_url'], 4, mapped_only=True)
+    category_names = dict(Category.objects.values_list('id', 'name'))
+
+    market_positions = {market: position for position, (market, _, _) in enumerate(MARKETS)}
+    return [
+        {
+            "name": product['name'],
+            "price": product['price'],
+            "image": product['image_url'],
+            "category": category_names.get(product['category_id']),
+            "original_category": product['main_category'],
+            "market_name": product['market']
+        }
+        for product in sorted(
+            products,
+            key=lambda x: (market_positions.get(x['market'], len(MARKETS)), x['category_id'], x['price'])
+        )
+    ]
+
+
+def discounted_products(limit=DISCOUNTED_PRODUCTS_LIMIT):
+    """The `limit` most discounted products, A101's excepted (it is not listed on the discounts page)."""
+    # Discount ranking, percentage and category label are all computed in SQL;
+    # only the requested page is fetched.
+    products = (
+        CatalogProduct.objects.discounted()
+        .exclude(market='a101')
+        .annotate(
+            discount_percentage=Round(F('discount_ratio') * 100),
+            category_label=display_category(),
+        )
+        .order_by('-discount_ratio', 'id')[:limit]
+    )
+    return DiscountedProductSerializer(products, many=True).data
+
+
+# Snapshot name -> (function building the response data, json.dumps parameters of the view)
+SNAPSHOTS = {
+    'cheapest-products': (cheapest_products, {}),
+    'cheapest-products-by-categories': (cheapest_products_by_categories, {}),
+    # Türkçe karakter desteği
+    'discounted-products': (discounted_products, {'ensure_ascii': False}),
+}
+
+snapshot_responses = {name: SnapshotResponse(name) for name in SNAPSHOTS}
+
+
+def render_snapshots():
+    """Render every snapshot from the catalog as it is now; run after each load and match.
+
+    Returns the size in bytes of each rendered snapshot.
+    """
+    started = time.perf_counter()
+    sizes = {}
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(), connection.cursor() as cursor:
+        if outermost:
+            # The version and every snapshot are read from one snapshot of the database
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        version, _ = read_version()
+        for name, (build, json_dumps_params) in SNAPSHOTS.items():
+            serialized = SerializedBody.serialize(build(), **json_dumps_params)
+            CatalogSnapshot.objects.update_or_create(name=name, defaults={
+                'version': version,
+                'body': serialized.body,
+                'gzip_body': serialized.gzip_body,
+                'digest': serialized.digest,
+            })
+            sizes[name] = len(serialized.body)
+    logger.info(f"Rendered {len(sizes)} snapshots of catalog version {version} in {time.perf_counter() - started:.1f}s")
+    return sizes
+
+
+def serve_snapshot(name, request):
+    """The snapshot response to `request`, or None if the current catalog version has none yet."""
+    return snapshot_responses[name].respond(request)
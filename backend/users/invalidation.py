@@ -0,0 +1,73 @@
+"""Catalog reloads announced to every worker on every node over Redis pub/sub.
+
+refresh_catalog and match_products publish the new catalog version once
+it is committed and its snapshots are rendered. Each worker listens in a
+background thread and re-reads the version and the autocomplete index
+right away. Everything a worker keeps in memory is keyed by catalog
+version, so its responses are then rebuilt on their next request.
+"""
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+from . import autocomplete, catalog_version
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'priceless:catalog-changed'
+
+# Seconds between attempts to subscribe again after losing Redis, doubled up to the maximum
+RETRY_DELAY = 1
+MAX_RETRY_DELAY = 60
+
+
+def publish_catalog_changed():
+    """Announce the current catalog version to every listening worker; call it after the load is committed.
+
+    Returns the number of workers that received it, or None when Redis
+    cannot be reached (the workers then notice the load by polling).
+    """
+    version, _ = catalog_version.read_version()
+    try:
+        client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=2, socket_timeout=2)
+        return client.publish(CHANNEL, version)
+    except redis.RedisError:
+        logger.exception(f"Announcing catalog version {version} failed")
+        return None
+
+
+def _catalog_changed():
+    catalog_version.refresh_in_background()
+    autocomplete.refresh_in_background()
+
+
+def _listen():
+    delay = RETRY_DELAY
+    resubscribing = False
+    while True:
+        try:
+            client = redis.Redis.from_url(settings.REDIS_URL, health_check_interval=30)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            if resubscribing:
+                # A load may have been announced while unsubscribed
+                _catalog_changed()
+            delay = RETRY_DELAY
+            while True:
+                message = pubsub.get_message(timeout=30)
+                if message is not None:
+                    logger.info(f"Catalog version {message['data'].decode()} announced")
+                    _catalog_changed()
+        except Exception:
+            logger.exception(f"Listening for catalog changes failed; retrying in {delay}s")
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+            resubscribing = True
+
+
+def listen():
+    """Follow catalog announcements in a background thread; called once per worker at start."""
+    threading.Thread(target=_listen, name='catalog-change-listener', daemon=True).start()
@@ -0,0 +1,131 @@
+"""An in-process LRU of values computed per catalog version, shared by one worker's threads."""
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .concurrency import submit_to_query_pool
+
+logger = logging.getLogger(__name__)
+
+# get() outcomes
+HIT, STALE, COMPUTED, JOINED = 'hit', 'stale', 'computed', 'joined'
+
+
+class _Entry:
+    def __init__(self, version, value, size, flight_number):
+        self.version = version
+        self.value = value
+        self.size = size
+        self.flight_number = flight_number
+
+
+class _Flight:
+    """One computation of a key, awaited by every request for it that arrives meanwhile."""
+
+    def __init__(self, version, number):
+        self.version = version
+        self.number = number
+        self.value = None
+        self.error = None
+        self.done = threading.Event()
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class LocalCache:
+    """A size-bounded LRU whose entries are each computed for one catalog version.
+
+    Concurrent misses of a key are computed once (single-flight): the
+    first request computes the value and the others wait for it. When
+    the catalog version moves on, requests keep getting the previous
+    version's value while one refresh runs on the catalog query pool
+    (stale-while-revalidate); with CATALOG_QUERY_WORKERS = 0 the first
+    request refreshes it in place instead.
+
+    Values weigh sizeof(value) bytes, and the least recently used ones are
+    evicted beyond max_bytes; None keeps every value.
+    """
+
+    def __init__(self, max_bytes=None, sizeof=None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._flights = {}
+        self._flight_numbers = itertools.count()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, compute):
+        """(outcome, version, value) of `key`: its value, computed by compute() for `version` when missing.
+
+        The outcome is HIT, STALE (the value of an earlier version),
+        COMPUTED (by this call) or JOINED (computed by a concurrent call).
+        Values that compute() returns as None are handed to the waiting
+        calls but not stored.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry.version == version:
+                    return HIT, entry.version, entry.value
+            flight = self._flights.get(key)
+            leading = flight is None or flight.version != version
+            if leading:
+                flight = self._flights[key] = _Flight(version, next(self._flight_numbers))
+            if entry is not None and settings.CATALOG_QUERY_WORKERS:
+                if leading:
+                    submit_to_query_pool(self._refresh, key, flight, compute)
+                return STALE, entry.version, entry.value
+
+        if not leading:
+            return JOINED, version, flight.wait()
+        self._fly(key, flight, compute)
+        return COMPUTED, version, flight.wait()
+
+    def _refresh(self, key, flight, compute):
+        self._fly(key, flight, compute)
+        if flight.error is not None:
+            logger.error(f"Refreshing {key!r} failed", exc_info=flight.error)
+
+    def _fly(self, key, flight, compute):
+        try:
+            flight.value = compute()
+        except Exception as error:
+            flight.error = error
+        finally:
+            with self._lock:
+                if flight.value is not None:
+                    self._store(key, flight)
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def _store(self, key, flight):
+        entry = self._entries.get(key)
+        if entry is not None and entry.flight_number > flight.number:
+            # A flight started later (for a newer version) already finished
+            return
+        size = self.sizeof(flight.value)
+        if entry is not None:
+            del self._entries[key]
+            self._bytes -= entry.size
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self._entries[key] = _Entry(flight.version, flight.value, size, flight.number)
+        self._bytes += size
+        while self.max_bytes is not None and self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,168 @@
+import itertools
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import JsonResponse
+from django.test import RequestFactory
+
+from users.models import MARKETS, CatalogProduct
+from users import autocomplete, homepage, views
+
+
+class Rollback(Exception):
+    pass
+
+
+# Product words of the synthetic catalog. Several share trigrams with the
+# search scenarios' queries (sucuk/sut, gofret/cikolata), but none match them.
+SYNTHETIC_WORDS = (
+    'Sucuk', 'Sabun', 'Sos', 'Şeker', 'Salça', 'Un', 'Makarna', 'Pirinç', 'Yağ', 'Çay',
+    'Kahve', 'Peynir', 'Yoğurt', 'Tuz', 'Bisküvi', 'Gofret', 'Deterjan', 'Şampuan', 'Zeytin', 'Bal',
+)
+
+
+# The view answers from the snapshot held in memory; time the query it stands in for
+def cheapest_products(factory):
+    return JsonResponse(homepage.cheapest_products(), safe=False)
+
+
+# The synthetic products never match the search scenarios, so the result set
+# stays the same as the catalog grows
+def search_products(factory):
+    return views.search_products(factory.get('/api/search/', {'q': 'süt'}))
+
+
+def fuzzy_search_products(factory):
+    return views.search_products(factory.get('/api/search/', {'q': 'sut', 'mode': 'fuzzy'}))
+
+
+def filtered_products(factory):
+    request = factory.get('/api/products/filtered/', {'category': 'Temel Gıda', 'in_stock': 'true'})
+    return views.HomePageProductListAPIView.as_view()(request)
+
+
+# Every prefix typed on the way to two queries, one request per keystroke
+AUTOCOMPLETE_KEYSTROKES = itertools.cycle(
+    query[:length] for query in ('sentetik sucuk', 'pınar süt') for length in range(1, len(query) + 1)
+)
+
+
+def autocomplete_products(factory):
+    return views.autocomplete_products(factory.get('/api/autocomplete/', {'q': next(AUTOCOMPLETE_KEYSTROKES)}))
+
+
+def rebuild_autocomplete_index():
+    # Built on this connection, so it sees the uncommitted synthetic products
+    autocomplete.rebuild()
+
+
+# Endpoint scenarios: name -> callable(request_factory) -> response
+SCENARIOS = {
+    'cheapest-products': cheapest_products,
+    'filtered-products': filtered_products,
+    'search': search_products,
+    'fuzzy-search': fuzzy_search_products,
+    'autocomplete': autocomplete_products,
+}
+
+# Run after the catalog grows, before a scenario is measured at the new size
+SCENARIO_SETUP = {
+    'autocomplete': rebuild_autocomplete_index,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure endpoint latency while the catalog grows with synthetic products. '
+        'The synthetic rows are inserted in a transaction that is rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='cheapest-products')
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Synthetic catalog sizes to measure at, in rows')
+        parser.add_argument('--repeat', type=int, default=50, help='Requests per catalog size')
+        parser.add_argument('--p99-budget', type=float,
+                            help='Fail if the p99 latency at any catalog size exceeds this many ms')
+
+    def add_synthetic_products(self, cursor, count, start):
+        cursor.execute(
+            f"""
+            INSERT INTO {CatalogProduct._meta.db_table} (
+                market, source_id, main_category, sub_category, lowest_category, name,
+                price_kurus, high_price_kurus, in_stock, product_link, page_link, image_url, date
+            )
+            SELECT
+                (%s::text[])[1 + i %% %s], -i, 'Temel Gıda', 'Bakliyat', 'Pirinç',
+                'Sentetik ' || (%s::text[])[1 + i %% %s] || ' ' || i, 100 + (random() * 50000)::integer,
+                NULL, i %% 4 <> 0, '', '', '', current_date
+            FROM generate_series(%s, %s) AS i
+            """,
+            [
+                [market for market, _, _ in MARKETS], len(MARKETS),
+                list(SYNTHETIC_WORDS), len(SYNTHETIC_WORDS), start + 1, start + count,
+            ],
+        )
+        # What the VACUUM after refresh_catalog does: statistics, and GIN pending lists merged into the index
+        cursor.execute(f"ANALYZE {CatalogProduct._meta.db_table}")
+        cursor.execute(
+            """
+            SELECT gin_clean_pending_list(i.indexrelid)
+            FROM pg_inherits h
+            JOIN pg_index i ON i.indrelid = h.inhrelid
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = c.relam
+            WHERE h.inhparent = %s::regclass AND am.amname = 'gin'
+            """,
+            [CatalogProduct._meta.db_table],
+        )
+
+    def catalog_size(self, cursor):
+        """Table and index size of the catalog partitions, in MB."""
+        cursor.execute(
+            "SELECT sum(pg_table_size(inhrelid)), sum(pg_indexes_size(inhrelid)) "
+            "FROM pg_inherits WHERE inhparent = %s::regclass",
+            [CatalogProduct._meta.db_table],
+        )
+        return [size / 2 ** 20 for size in cursor.fetchone()]
+
+    def handle(self, *args, **options):
+        scenario = SCENARIOS[options['scenario']]
+        # The search view builds absolute next links, so the host must be an allowed one
+        factory = RequestFactory(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+        self.stdout.write(f"{'rows':>10} {'table MB':>10} {'index MB':>10} {'p50 ms':>10} {'p99 ms':>10}")
+        over_budget = []
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                inserted = 0
+                for size in sorted(options['sizes']):
+                    self.add_synthetic_products(cursor, size - inserted, inserted)
+                    inserted = size
+                    if options['scenario'] in SCENARIO_SETUP:
+                        SCENARIO_SETUP[options['scenario']]()
+                    scenario(factory)  # warm up
+                    timings = []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        scenario(factory)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    timings.sort()
+                    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+                    table_size, index_size = self.catalog_size(cursor)
+                    self.stdout.write(
+                        f"{size:>10} {table_size:>10.1f} {index_size:>10.1f} "
+                        f"{statistics.median(timings):>10.2f} {p99:>10.2f}"
+                    )
+                    if options['p99_budget'] is not None and p99 > options['p99_budget']:
+                        over_budget.append(size)
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS('Synthetic products rolled back.'))
+        if over_budget:
+            raise CommandError(
+                f"p99 latency over the {options['p99_budget']} ms budget at "
+                f"{', '.join(str(size) for size in over_budget)} rows"
+            )
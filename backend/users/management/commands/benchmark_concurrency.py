@@ -0,0 +1,73 @@
+import statistics
+import threading
+import time
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure catalog endpoints under concurrent requests against a running server, e.g. '
+        '`daphne PriceLess.asgi:application`. Start the server once with CATALOG_QUERY_WORKERS=0 '
+        '(every request served from the shared sync thread, as sync views are) and once with the '
+        'default pool to compare. --clients clients request --url while one client requests '
+        '--probe-url, a cheap endpoint that shows how long requests queue behind the slow ones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', default='http://127.0.0.1:8000', help='Base URL of the running server')
+        parser.add_argument('--url', default='/api/search/?q=sut&mode=fuzzy', help='Endpoint the clients request')
+        parser.add_argument('--probe-url', default='/api/cheapest-products/', help='Cheap endpoint requested alongside')
+        parser.add_argument('--clients', type=int, default=4, help='Concurrent clients requesting --url')
+        parser.add_argument('--requests', type=int, default=25, help='Requests per client')
+
+    def client(self, url, count, timings, errors):
+        session = requests.Session()
+        for _ in range(count):
+            started = time.perf_counter()
+            response = session.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 500:
+                errors.append(f'{url} returned {response.status_code}')
+
+    def handle(self, *args, **options):
+        url = options['server'] + options['url']
+        probe_url = options['server'] + options['probe_url']
+        errors = []
+        self.client(url, 1, [], errors)  # warm up
+        self.client(probe_url, 1, [], errors)
+
+        timings, probe_timings = [], []
+        clients = [
+            threading.Thread(target=self.client, args=(url, options['requests'], timings, errors))
+            for _ in range(options['clients'])
+        ]
+        stop = threading.Event()
+
+        def probe():
+            while not stop.is_set():
+                self.client(probe_url, 1, probe_timings, errors)
+
+        prober = threading.Thread(target=probe)
+        started = time.perf_counter()
+        for thread in [*clients, prober]:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        wall = time.perf_counter() - started
+        stop.set()
+        prober.join()
+        if errors:
+            raise CommandError(errors[0])
+
+        self.stdout.write(f"{'endpoint':<40} {'requests':>8} {'p50 ms':>10} {'p99 ms':>10}")
+        for name, endpoint_timings in ((options['url'], timings), (options['probe_url'], probe_timings)):
+            p50, p99 = percentiles(endpoint_timings)
+            self.stdout.write(f"{name:<40} {len(endpoint_timings):>8} {p50:>10.2f} {p99:>10.2f}")
+        self.stdout.write(f"{len(timings)} requests to {options['url']} in {wall:.2f}s")
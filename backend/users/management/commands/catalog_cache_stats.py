@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from users.response_cache import cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show the hits and misses of the shared catalog response cache, per endpoint, since Redis started'
+
+    def handle(self, *args, **options):
+        for name, counts in cache_stats(list(settings.CATALOG_CACHE_TIMEOUTS)).items():
+            lookups = counts['hits'] + counts['misses']
+            ratio = f"{counts['hits'] / lookups:.1%}" if lookups else '-'
+            self.stdout.write(f"{name:<32} {counts['hits']:>10} hits {counts['misses']:>10} misses {ratio:>7}")
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from users.homepage import render_snapshots
+from users.invalidation import publish_catalog_changed
+from users.matching import match_products
+
+
+class Command(BaseCommand):
+    help = (
+        'Find the products every market sells under its own name and link them to shared '
+        'canonical products (run after refresh_catalog, which runs it by default)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, help='Worker processes (default: one per core)')
+
+    def handle(self, *args, **options):
+        stats = match_products(options['processes'])
+        report(self.stdout, stats)
+        if stats['updated']:
+            # The catalog version moved on, and with it the home page snapshots
+            render_snapshots()
+            announce(self.stdout)
+
+
+def announce(stdout):
+    receivers = publish_catalog_changed()
+    if receivers is not None:
+        stdout.write(f"Catalog change announced to {receivers} workers")
+
+
+def report(stdout, stats):
+    stdout.write(
+        f"{stats['products']} products, {stats['blocks']} blocks, "
+        f"{stats['candidate_pairs']} candidate pairs compared, {stats['matched_pairs']} matched"
+    )
+    for stage, seconds in stats['seconds'].items():
+        stdout.write(f"  {stage:<10} {seconds:>8.2f}s")
+    stdout.write(
+        f"{stats['canonical_products']} canonical products; "
+        f"{stats['updated']} catalog products relinked in {sum(stats['seconds'].values()):.1f}s"
+    )
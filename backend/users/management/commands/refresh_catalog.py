@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from users.catalog import refresh_catalog
+from users.homepage import render_snapshots
+from users.matching import match_products
+
+from .match_products import announce, report
+
+
+class Command(BaseCommand):
+    help = (
+        'Reload the unified catalog_products table from the per-market product tables, match the products '
+        'across markets, render the home page snapshots and announce the new catalog to the workers '
+        '(run after each data load)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-matching', action='store_true',
+                            help='Do not match the reloaded products across markets (see match_products)')
+
+    def handle(self, *args, **options):
+        counts = refresh_catalog()
+        for market, count in counts.items():
+            self.stdout.write(f"{market}: {count} products")
+        self.stdout.write(self.style.SUCCESS(f"Catalog refreshed with {sum(counts.values())} products."))
+        if not options['skip_matching']:
+            report(self.stdout, match_products())
+        for name, size in render_snapshots().items():
+            self.stdout.write(f"Rendered the {name} snapshot ({size} bytes)")
+        announce(self.stdout)
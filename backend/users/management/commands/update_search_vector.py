@@ -1,12 +1,26 @@
+import datetime
+
 from django.core.management.base import BaseCommand
-# Commenting out SearchVector import as we're not using it temporarily
-# from django.contrib.postgres.search import SearchVector
-from users.models import Product  
+
+from users.catalog import update_search_vectors
+
 
 class Command(BaseCommand):
-    help = 'Update search_vector field for products'
+    help = (
+        'Recompute search_vector of catalog products in batches. New and renamed products get '
+        'theirs from a trigger, so this is only needed for rows it missed or after the vector '
+        'definition changes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=datetime.date.fromisoformat,
+                            help='Only products scraped on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--changed-only', action='store_true',
+                            help='Only rows whose stored vector is missing or out of date')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per committed batch')
 
-    def handle(self, *args, **kwargs):
-        # Commented out search_vector update as we're not using it temporarily
-        # Product.objects.update(search_vector=SearchVector('name', 'main_category', 'market_name', config='turkish'))
-        self.stdout.write(self.style.SUCCESS('Search vector update skipped as functionality is temporarily disabled.'))
+    def handle(self, *args, **options):
+        count = update_search_vectors(
+            since=options['since'], changed_only=options['changed_only'], batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Search vectors updated for {count} products.'))
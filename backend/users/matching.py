@@ -0,0 +1,374 @@
+"""Cross-market product matching: which catalog rows are the same product.
+
+match_products() runs offline after each catalog load, in stages:
+
+1. load      (id, market, name) of every catalog product
+2. normalize each name into a brand, a package size and a token set
+             (worker processes)
+3. block     group products by (brand, size); only products of the same
+             block are compared, and oversized blocks are split by token
+4. score     IDF-weighted token-set similarity of every cross-market pair
+             in a block (worker processes)
+5. cluster   merge matched pairs, best first, into canonical products that
+             hold at most one product per market
+6. store     rebuild canonical_products and relink the catalog products whose
+             canonical product changed; ids carry over from the previous run
+"""
+import logging
+import math
+import multiprocessing
+import re
+import time
+from collections import Counter, defaultdict
+from io import StringIO
+
+from django.db import connection, transaction
+
+from .catalog_version import bump_version
+from .models import MARKETS, CanonicalProduct, CatalogProduct
+from .text import turkish_casefold
+
+logger = logging.getLogger(__name__)
+
+# Minimum similarity for two products of different markets to be the same product
+MATCH_THRESHOLD = 0.8
+
+# Blocks with more products than this are split by token before scoring, so
+# that no block costs more than MAX_BLOCK_SIZE² / 2 comparisons
+MAX_BLOCK_SIZE = 200
+
+# Products per normalization task and pairs per scoring task sent to a worker
+NORMALIZE_CHUNK_SIZE = 20000
+SCORE_TASK_PAIRS = 200000
+
+ASCII_FOLD = str.maketrans('çğıöşüâîû', 'cgiosuaiu')
+
+# Package sizes, normalized to grams and millilitres
+SIZE_PATTERN = re.compile(r'(\d+(?:[.,]\d+)?)\s*(kg|gr|gram|g|lt|litre|l|ml|cl)\b')
+SIZE_UNITS = {
+    'kg': ('g', 1000), 'gr': ('g', 1), 'gram': ('g', 1), 'g': ('g', 1),
+    'lt': ('ml', 1000), 'litre': ('ml', 1000), 'l': ('ml', 1000), 'ml': ('ml', 1), 'cl': ('ml', 10),
+}
+# Pack counts: "10'lu", "6 x", "4 adet"
+PACK_PATTERN = re.compile(r"(\d+)\s*(?:'?\s*l[iu]\b|x\b|adet\b)")
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def normalize(name):
+    """(brand, size, tokens) of a product name.
+
+    The name is casefolded the Turkish way and stripped of diacritics, so
+    "Pastörize" and "Pastorize" agree. The size ("1 L", "1000 ml") is
+    parsed into grams or millilitres and a pack count ("6'lı") multiplies
+    it; the brand is the first word of what remains.
+    """
+    text = turkish_casefold(name).translate(ASCII_FOLD)
+    size = ''
+    match = SIZE_PATTERN.search(text)
+    if match:
+        unit, factor = SIZE_UNITS[match.group(2)]
+        amount = float(match.group(1).replace(',', '.')) * factor
+        text = text[:match.start()] + ' ' + text[match.end():]
+        pack = PACK_PATTERN.search(text)
+        if pack:
+            amount *= int(pack.group(1))
+            text = text[:pack.start()] + ' ' + text[pack.end():]
+        size = f'{amount:g} {unit}'
+    tokens = TOKEN_PATTERN.findall(text)
+    brand = tokens[0] if tokens else ''
+    return brand, size, frozenset(tokens)
+
+
+def _normalize_chunk(names):
+    return [normalize(name) for name in names]
+
+
+# The scoring workers are forked after these are set, so they share them
+# with the parent instead of receiving them with every task.
+_markets = None
+_tokens = None
+_weights = None
+
+
+def similarity(first, second):
+    """IDF-weighted Jaccard similarity of two token sets.
+
+    Rare tokens ("laktozsuz", "yarım") weigh more than tokens most products
+    share ("süt"), so variants of one brand's product stay apart.
+    """
+    shared = sum(_weights[token] for token in first & second)
+    if not shared:
+        return 0.0
+    return shared / sum(_weights[token] for token in first | second)
+
+
+def _score_blocks(blocks):
+    """Matched (score, first, second) pairs of a list of blocks, and the number of pairs compared."""
+    matches = []
+    compared = 0
+    for block in blocks:
+        for position, first in enumerate(block):
+            for second in block[position + 1:]:
+                if _markets[first] == _markets[second]:
+                    continue
+                compared += 1
+                score = similarity(_tokens[first], _tokens[second])
+                if score >= MATCH_THRESHOLD:
+                    matches.append((score, first, second))
+    return matches, compared
+
+
+def split_block(block, tokens, frequencies, depth=0):
+    """Split an oversized block by each product's depth-th rarest token.
+
+    Two products that differ in that token are never compared; in blocks
+    this large (a store brand's hundreds of products of one size) the
+    rarest tokens are what tell products apart anyway.
+    """
+    if len(block) <= MAX_BLOCK_SIZE:
+        return [block]
+    sub_blocks = defaultdict(list)
+    for product in block:
+        ranked = sorted(tokens[product], key=lambda token: (frequencies[token], token))
+        sub_blocks[ranked[depth] if depth < len(ranked) else None].append(product)
+    pieces = []
+    for token, sub_block in sub_blocks.items():
+        if token is None:
+            # Out of tokens to split on: the products are alike, compare the first ones
+            pieces.append(sub_block[:MAX_BLOCK_SIZE])
+        else:
+            pieces.extend(split_block(sub_block, tokens, frequencies, depth + 1))
+    return pieces
+
+
+def cluster(count, markets, matches):
+    """Canonical product number of each of `count` products.
+
+    Matches are merged best first, and only when the two groups have no
+    market in common: a canonical product is sold at most once per market,
+    which also keeps "Yağlı Süt" from chaining into "Yarım Yağlı Süt".
+    """
+    parent = list(range(count))
+    group_markets = [{market} for market in markets]
+
+    def root(product):
+        while parent[product] != product:
+            parent[product] = parent[parent[product]]
+            product = parent[product]
+        return product
+
+    for _, first, second in sorted(matches, reverse=True):
+        first, second = root(first), root(second)
+        if first == second or group_markets[first] & group_markets[second]:
+            continue
+        parent[second] = first
+        group_markets[first] |= group_markets[second]
+        group_markets[second] = None
+
+    numbers = {}
+    return [numbers.setdefault(root(product), len(numbers) + 1) for product in range(count)]
+
+
+def canonical_ids(groups, previous, new_ids):
+    """Canonical product id of each group of `groups`, kept stable across runs.
+
+    A group takes the id most of its products had before (`previous`, as
+    refresh_catalog carries ids over by market and source id), unless a larger
+    group took it first; groups without one get an id from `new_ids(count)`.
+    """
+    members = defaultdict(list)
+    for product, group in enumerate(groups):
+        members[group].append(product)
+    assigned, taken, unassigned = {}, set(), []
+    for group, products in sorted(members.items(), key=lambda item: (-len(item[1]), item[0])):
+        votes = Counter(previous[product] for product in products if previous[product] is not None)
+        for candidate, _ in votes.most_common():
+            if candidate not in taken:
+                assigned[group] = candidate
+                taken.add(candidate)
+                break
+        else:
+            unassigned.append(group)
+    assigned.update(zip(unassigned, new_ids(len(unassigned))))
+    return assigned
+
+
+def store(ids, markets, names, previous, normalized, groups):
+    """Rebuild canonical_products and link every catalog product to its canonical product.
+
+    Only catalog rows whose link changed are updated. Returns the number of
+    canonical products and of relinked catalog rows.
+    """
+    table = CanonicalProduct._meta.db_table
+    market_order = {market: position for position, (market, _, _) in enumerate(MARKETS)}
+    # group -> (product it is named after: the first market's, market count)
+    canonical = {}
+    for product, group in enumerate(groups):
+        named_after, market_count = canonical.get(group, (product, 0))
+        if market_order[markets[product]] < market_order[markets[named_after]]:
+            named_after = product
+        canonical[group] = (named_after, market_count + 1)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        def new_ids(count):
+            # Past every id carried over, which rows copied in with their id did not advance the sequence to
+            cursor.execute(
+                """
+                SELECT setval(pg_get_serial_sequence(%s, 'id'),
+                              GREATEST(nextval(pg_get_serial_sequence(%s, 'id')), %s))
+                """,
+                [table, table, max(filter(None, previous), default=0)],
+            )
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)", [table, count]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+        group_ids = canonical_ids(groups, previous, new_ids)
+        cursor.execute(f"TRUNCATE {table}")
+        copy_rows(cursor, table, ['id', 'name', 'brand', 'size', 'market_count'], (
+            (group_ids[group], names[product], normalized[product][0], normalized[product][1], market_count)
+            for group, (product, market_count) in canonical.items()
+        ))
+        links = [
+            (market, product_id, group_ids[group])
+            for market, product_id, old_id, group in zip(markets, ids, previous, groups)
+            if group_ids[group] != old_id
+        ]
+        # Rows already linked right are left alone, so they are neither rewritten nor bloated
+        cursor.execute(
+            "CREATE TEMPORARY TABLE catalog_product_links "
+            "(market text, id bigint, canonical_product_id bigint) ON COMMIT DROP"
+        )
+        copy_rows(cursor, 'catalog_product_links', ['market', 'id', 'canonical_product_id'], links)
+        cursor.execute("ANALYZE catalog_product_links")
+        cursor.execute(
+            f"""
+            UPDATE {CatalogProduct._meta.db_table} p
+            SET canonical_product_id = l.canonical_product_id
+            FROM catalog_product_links l
+            WHERE p.market = l.market AND p.id = l.id
+            """
+        )
+        if cursor.rowcount:
+            bump_version()
+        return len(canonical), cursor.rowcount
+
+
+# Characters COPY's text format needs escaped
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def copy_rows(cursor, table, columns, rows):
+    """COPY rows of non-NULL values into table."""
+    buffer = StringIO()
+    for row in rows:
+        buffer.write('\t'.join(str(value).translate(COPY_ESCAPES) for value in row) + '\n')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def find_matches(markets, names, processes=None, stats=None):
+    """Canonical product number of each product, given the products' markets and names.
+
+    Normalizes, blocks, scores and clusters; `processes` worker processes
+    (default: one per core) normalize and score. Counts and per-stage
+    seconds are added to `stats`. Returns the normalized names and the numbers.
+    """
+    global _markets, _tokens, _weights
+    stats = {} if stats is None else stats
+    timings = stats.setdefault('seconds', {})
+    processes = processes or multiprocessing.cpu_count()
+    # Forked workers inherit the products instead of having them pickled to them
+    context = multiprocessing.get_context('fork')
+
+    started = time.perf_counter()
+    chunks = [names[start:start + NORMALIZE_CHUNK_SIZE] for start in range(0, len(names), NORMALIZE_CHUNK_SIZE)]
+    with context.Pool(processes) as pool:
+        normalized = [product for chunk in pool.imap(_normalize_chunk, chunks) for product in chunk]
+    timings['normalize'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    tokens = [product_tokens for _, _, product_tokens in normalized]
+    frequencies = Counter(token for product_tokens in tokens for token in product_tokens)
+    blocks = defaultdict(list)
+    for product, (brand, size, _) in enumerate(normalized):
+        blocks[brand, size].append(product)
+    scored_blocks = [
+        piece
+        for block in blocks.values() if len({markets[product] for product in block}) > 1
+        for piece in split_block(block, tokens, frequencies)
+    ]
+    stats['blocks'] = len(scored_blocks)
+    timings['block'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    tasks, task, task_pairs = [], [], 0
+    for block in scored_blocks:
+        task.append(block)
+        task_pairs += len(block) * (len(block) - 1) // 2
+        if task_pairs >= SCORE_TASK_PAIRS:
+            tasks.append(task)
+            task, task_pairs = [], 0
+    if task:
+        tasks.append(task)
+    matches = []
+    stats['candidate_pairs'] = 0
+    _markets, _tokens = markets, tokens
+    _weights = {token: math.log(len(names) / frequency) + 1 for token, frequency in frequencies.items()}
+    try:
+        with context.Pool(processes) as pool:
+            for task_matches, compared in pool.imap_unordered(_score_blocks, tasks):
+                matches.extend(task_matches)
+                stats['candidate_pairs'] += compared
+    finally:
+        _markets = _tokens = _weights = None
+    stats['matched_pairs'] = len(matches)
+    timings['score'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    groups = cluster(len(names), markets, matches)
+    timings['cluster'] = time.perf_counter() - started
+    return normalized, groups
+
+
+def match_products(processes=None):
+    """Match the whole catalog across markets and store the canonical products.
+
+    Returns the run's statistics: product, block, pair and canonical product
+    counts, and the seconds spent in each stage.
+    """
+    stats = {'seconds': {}}
+    timings = stats['seconds']
+
+    started = time.perf_counter()
+    ids, markets, names, previous = [], [], [], []
+    # A fixed order breaks score ties the same way every run, so unchanged products keep their canonical product
+    rows = CatalogProduct.objects.order_by('market', 'source_id').values_list(
+        'id', 'market', 'name', 'canonical_product_id'
+    )
+    for product_id, market, name, canonical_product_id in rows.iterator(chunk_size=NORMALIZE_CHUNK_SIZE):
+        ids.append(product_id)
+        markets.append(market)
+        names.append(name)
+        previous.append(canonical_product_id)
+    stats['products'] = len(ids)
+    timings['load'] = time.perf_counter() - started
+
+    normalized, groups = find_matches(markets, names, processes, stats)
+
+    started = time.perf_counter()
+    stats['canonical_products'], stats['updated'] = store(ids, markets, names, previous, normalized, groups)
+    if stats['updated']:
+        # Relinked rows need the visibility map set again for index-only scans
+        with connection.cursor() as cursor:
+            cursor.execute(f"VACUUM (ANALYZE) {CatalogProduct._meta.db_table}")
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {CanonicalProduct._meta.db_table}")
+    timings['store'] = time.perf_counter() - started
+
+    logger.info(
+        f"Matched {stats['products']} products into {stats['canonical_products']} canonical products "
+        f"({stats['candidate_pairs']} pairs compared)"
+    )
+    return stats
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_carrefourproduct_marketpaketiproduct_migrosproduct_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogProduct',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('market', models.TextField()),
+                ('source_id', models.BigIntegerField()),
+                ('main_category', models.TextField()),
+                ('sub_category', models.TextField()),
+                ('lowest_category', models.TextField()),
+                ('name', models.TextField()),
+                ('price', models.FloatField()),
+                ('high_price', models.FloatField(blank=True, null=True)),
+                ('in_stock', models.TextField()),
+                ('product_link', models.TextField()),
+                ('page_link', models.TextField()),
+                ('image_url', models.TextField()),
+                ('date', models.TextField()),
+                ('market_name', models.TextField()),
+            ],
+            options={
+                'db_table': 'catalog_products',
+                'managed': False,
+            },
+        ),
+        # Partitions (one per market) are created by the refresh_catalog command.
+        migrations.RunSQL(
+            sql="""
+                CREATE SEQUENCE catalog_products_id_seq;
+                CREATE TABLE catalog_products (
+                    id bigint NOT NULL DEFAULT nextval('catalog_products_id_seq'),
+                    market text NOT NULL,
+                    source_id bigint NOT NULL,
+                    main_category text,
+                    sub_category text,
+                    lowest_category text,
+                    name text,
+                    price double precision,
+                    high_price double precision,
+                    in_stock text,
+                    product_link text,
+                    page_link text,
+                    image_url text,
+                    date text,
+                    market_name text,
+                    PRIMARY KEY (market, id),
+                    UNIQUE (market, source_id)
+                ) PARTITION BY LIST (market);
+                ALTER SEQUENCE catalog_products_id_seq OWNED BY catalog_products.id;
+            """,
+            reverse_sql="DROP TABLE catalog_products;",
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_catalogproduct'),
+    ]
+
+    operations = [
+        # Serves the (market, price, id) keyset pagination of the catalog endpoints.
+        migrations.RunSQL(
+            sql="CREATE INDEX catalog_products_market_price_id_idx ON catalog_products (market, price, id);",
+            reverse_sql="DROP INDEX catalog_products_market_price_id_idx;",
+        ),
+    ]
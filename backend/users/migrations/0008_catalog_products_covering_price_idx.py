@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_catalog_products_market_price_id_idx'),
+    ]
+
+    operations = [
+        # Carry name and image_url in the (market, price, id) index so the
+        # cheapest-products top-k per market is answered by an index-only scan.
+        migrations.RunSQL(
+            sql="""
+                DROP INDEX catalog_products_market_price_id_idx;
+                CREATE INDEX catalog_products_market_price_id_idx
+                    ON catalog_products (market, price, id) INCLUDE (name, image_url);
+            """,
+            reverse_sql="""
+                DROP INDEX catalog_products_market_price_id_idx;
+                CREATE INDEX catalog_products_market_price_id_idx ON catalog_products (market, price, id);
+            """,
+        ),
+    ]
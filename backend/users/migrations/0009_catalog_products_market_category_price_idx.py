@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_catalog_products_covering_price_idx'),
+    ]
+
+    operations = [
+        # Feeds the per-(market, main_category) ROW_NUMBER() in price order.
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX catalog_products_market_category_price_idx
+                    ON catalog_products (market, main_category, price, id);
+            """,
+            reverse_sql="DROP INDEX catalog_products_market_category_price_idx;",
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_catalog_products_market_category_price_idx'),
+    ]
+
+    operations = [
+        # Discounted products only, in discount order: the discounted products
+        # page reads its first rows instead of ranking every discounted product.
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX catalog_products_discount_idx
+                    ON catalog_products (((high_price - price) / high_price) DESC, id)
+                    WHERE price < high_price;
+            """,
+            reverse_sql="DROP INDEX catalog_products_discount_idx;",
+        ),
+    ]
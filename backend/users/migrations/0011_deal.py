@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_catalog_products_discount_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Deal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('market', models.TextField()),
+                ('source_id', models.BigIntegerField()),
+                ('name', models.TextField()),
+                ('price', models.FloatField()),
+                ('high_price', models.FloatField()),
+                ('image_url', models.TextField()),
+                ('product_link', models.TextField()),
+                ('main_category', models.TextField()),
+                ('sub_category', models.TextField()),
+                ('lowest_category', models.TextField()),
+                ('category', models.TextField()),
+                ('discount_ratio', models.FloatField()),
+                ('discount_percentage', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'deals',
+                'indexes': [
+                    models.Index(fields=['-discount_ratio', '-id'], name='deals_discount_idx'),
+                    models.Index(fields=['category', '-discount_ratio', '-id'], name='deals_category_discount_idx'),
+                    models.Index(fields=['market', '-discount_ratio', '-id'], name='deals_market_discount_idx'),
+                ],
+            },
+        ),
+    ]
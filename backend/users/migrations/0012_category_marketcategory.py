@@ -0,0 +1,111 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CATEGORIES = [
+    ("fruits_vegetables", "Meyve ve Sebze"),
+    ("beverages", "İçecekler"),
+    ("meat_poultry_fish", "Et, Tavuk ve Balık"),
+    ("basic_food", "Temel Gıda"),
+    ("frozen_food", "Dondurulmuş Gıda"),
+]
+
+# Market categories previously hard-coded in DiscountedProductsAPIView and
+# cheapest_products_by_categories
+MARKET_CATEGORIES = {
+    "a101": {
+        "Et, Balık, Tavuk": "meat_poultry_fish",
+        "Temel Gıda": "basic_food",
+        "Dondurulmuş Ürünler": "frozen_food",
+        "İçecek": "beverages",
+    },
+    "migros": {
+        "Meyve, Sebze": "fruits_vegetables",
+        "İçecek": "beverages",
+        "Et, Tavuk, Balık": "meat_poultry_fish",
+        "Temel Gıda": "basic_food",
+        "Dondurulmuş Gıda": "frozen_food",
+    },
+    "sokmarket": {
+        "Meyve & Sebze": "fruits_vegetables",
+        "İçecek": "beverages",
+        "Et & Tavuk & Şarküteri": "meat_poultry_fish",
+        "Yemeklik Malzemeler": "basic_food",
+        "Dondurulmuş Ürünler": "frozen_food",
+    },
+    "mopas": {
+        "Sebze & Meyve": "fruits_vegetables",
+        "İçecekler": "beverages",
+        "Kırmızı/Beyaz Et": "meat_poultry_fish",
+        "Gıda & Şekerleme": "basic_food",
+    },
+    "marketpaketi": {
+        "GIDA": "basic_food",
+    },
+    "carrefour": {
+        "Meyve, Sebze": "fruits_vegetables",
+        "İçecekler": "beverages",
+        "Et, Tavuk, Balık": "meat_poultry_fish",
+        "Temel Gıda": "basic_food",
+        "Hazır Yemek&Donuk Ürünler": "frozen_food",
+    },
+}
+
+
+def seed_categories(apps, schema_editor):
+    Category = apps.get_model('users', 'Category')
+    MarketCategory = apps.get_model('users', 'MarketCategory')
+    categories = {key: Category.objects.create(key=key, name=name) for key, name in CATEGORIES}
+    for market, names in MARKET_CATEGORIES.items():
+        for name, key in names.items():
+            MarketCategory.objects.create(market=market, name=name, category=categories[key])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_deal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'db_table': 'categories',
+            },
+        ),
+        migrations.CreateModel(
+            name='MarketCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('market', models.CharField(max_length=50)),
+                ('name', models.CharField(max_length=255)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='market_categories', to='users.category')),
+            ],
+            options={
+                'db_table': 'market_categories',
+                'unique_together': {('market', 'name')},
+            },
+        ),
+        migrations.RunPython(seed_categories, migrations.RunPython.noop),
+        # catalog_products is unmanaged: the field is added to the model state
+        # and the column and its index are created by hand.
+        migrations.AddField(
+            model_name='catalogproduct',
+            name='category',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='users.category'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                ALTER TABLE catalog_products ADD COLUMN category_id bigint;
+                CREATE INDEX catalog_products_category_price_idx ON catalog_products (category_id, price);
+            """,
+            reverse_sql="ALTER TABLE catalog_products DROP COLUMN category_id;",
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_category_marketcategory'),
+    ]
+
+    operations = [
+        # Category-filtered catalog pages: category_id equality, then the
+        # (market, price, id) keyset order of the paginated endpoints.
+        migrations.RunSQL(
+            sql="""
+                DROP INDEX catalog_products_category_price_idx;
+                CREATE INDEX catalog_products_category_market_price_idx
+                    ON catalog_products (category_id, market, price, id);
+            """,
+            reverse_sql="""
+                DROP INDEX catalog_products_category_market_price_idx;
+                CREATE INDEX catalog_products_category_price_idx ON catalog_products (category_id, price);
+            """,
+        ),
+    ]
@@ -0,0 +1,127 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+import users.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_catalog_products_category_market_price_idx'),
+    ]
+
+    operations = [
+        # Parses the scraped date text of the per-market tables: ISO dates
+        # from merge_data.py and the MM/DD/YYYY dates of spreadsheet exports.
+        # Anything else (e.g. "#########") becomes NULL instead of failing a load.
+        migrations.RunSQL(
+            sql=r"""
+                CREATE FUNCTION catalog_parse_date(value text) RETURNS date AS $$
+                BEGIN
+                    IF value ~ '^\d{4}-\d{1,2}-\d{1,2}$' THEN
+                        RETURN value::date;
+                    ELSIF value ~ '^\d{1,2}/\d{1,2}/\d{4}$' THEN
+                        RETURN to_date(value, 'MM/DD/YYYY');
+                    END IF;
+                    RETURN NULL;
+                EXCEPTION WHEN datetime_field_overflow OR invalid_datetime_format THEN
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql IMMUTABLE;
+            """,
+            reverse_sql="DROP FUNCTION catalog_parse_date(text);",
+        ),
+        # Typed catalog columns: integer kuruş prices (4 bytes instead of 8,
+        # exact), boolean stock and a real date. market_name only repeated
+        # the market's display name, which MARKETS already provides.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""
+                        DROP INDEX catalog_products_discount_idx;
+                        ALTER TABLE catalog_products RENAME COLUMN price TO price_kurus;
+                        ALTER TABLE catalog_products RENAME COLUMN high_price TO high_price_kurus;
+                        ALTER TABLE catalog_products
+                            ALTER COLUMN price_kurus TYPE integer USING round(price_kurus * 100),
+                            ALTER COLUMN high_price_kurus TYPE integer USING round(high_price_kurus * 100),
+                            ALTER COLUMN in_stock TYPE boolean USING lower(in_stock) IN ('true', '1'),
+                            ALTER COLUMN date TYPE date USING catalog_parse_date(date),
+                            DROP COLUMN market_name;
+                        CREATE INDEX catalog_products_discount_idx
+                            ON catalog_products (
+                                ((high_price_kurus - price_kurus)::double precision / high_price_kurus::double precision) DESC,
+                                id
+                            )
+                            WHERE price_kurus < high_price_kurus;
+                    """,
+                    reverse_sql="""
+                        DROP INDEX catalog_products_discount_idx;
+                        ALTER TABLE catalog_products
+                            ALTER COLUMN price_kurus TYPE double precision USING price_kurus / 100.0,
+                            ALTER COLUMN high_price_kurus TYPE double precision USING high_price_kurus / 100.0,
+                            ALTER COLUMN in_stock TYPE text USING CASE WHEN in_stock THEN 'TRUE' ELSE 'FALSE' END,
+                            ALTER COLUMN date TYPE text USING to_char(date, 'MM/DD/YYYY'),
+                            ADD COLUMN market_name text;
+                        ALTER TABLE catalog_products RENAME COLUMN price_kurus TO price;
+                        ALTER TABLE catalog_products RENAME COLUMN high_price_kurus TO high_price;
+                        CREATE INDEX catalog_products_discount_idx
+                            ON catalog_products (((high_price - price) / high_price) DESC, id)
+                            WHERE price < high_price;
+                    """,
+                ),
+                migrations.RunSQL(
+                    sql="""
+                        ALTER TABLE deals RENAME COLUMN price TO price_kurus;
+                        ALTER TABLE deals RENAME COLUMN high_price TO high_price_kurus;
+                        ALTER TABLE deals
+                            ALTER COLUMN price_kurus TYPE integer USING round(price_kurus * 100),
+                            ALTER COLUMN high_price_kurus TYPE integer USING round(high_price_kurus * 100);
+                    """,
+                    reverse_sql="""
+                        ALTER TABLE deals
+                            ALTER COLUMN price_kurus TYPE double precision USING price_kurus / 100.0,
+                            ALTER COLUMN high_price_kurus TYPE double precision USING high_price_kurus / 100.0;
+                        ALTER TABLE deals RENAME COLUMN price_kurus TO price;
+                        ALTER TABLE deals RENAME COLUMN high_price_kurus TO high_price;
+                    """,
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='catalogproduct',
+                    name='price',
+                    field=users.fields.KurusField(db_column='price_kurus'),
+                ),
+                migrations.AlterField(
+                    model_name='catalogproduct',
+                    name='high_price',
+                    field=users.fields.KurusField(blank=True, db_column='high_price_kurus', null=True),
+                ),
+                migrations.AlterField(
+                    model_name='catalogproduct',
+                    name='in_stock',
+                    field=models.BooleanField(),
+                ),
+                migrations.AlterField(
+                    model_name='catalogproduct',
+                    name='date',
+                    field=models.DateField(blank=True, null=True),
+                ),
+                migrations.RemoveField(
+                    model_name='catalogproduct',
+                    name='market_name',
+                ),
+                migrations.AlterField(
+                    model_name='deal',
+                    name='price',
+                    field=users.fields.KurusField(db_column='price_kurus'),
+                ),
+                migrations.AlterField(
+                    model_name='deal',
+                    name='high_price',
+                    field=users.fields.KurusField(db_column='high_price_kurus'),
+                ),
+            ],
+        ),
+    ]
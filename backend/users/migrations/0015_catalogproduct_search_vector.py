@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:05
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_catalog_typed_columns'),
+    ]
+
+    operations = [
+        # Filled by refresh_catalog; run update_search_vector once to fill the existing catalog.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""
+                        ALTER TABLE catalog_products ADD COLUMN search_vector tsvector;
+                        CREATE INDEX catalog_products_search_idx ON catalog_products USING gin (search_vector);
+                    """,
+                    reverse_sql="ALTER TABLE catalog_products DROP COLUMN search_vector;",
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='catalogproduct',
+                    name='search_vector',
+                    field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+                ),
+            ],
+        ),
+    ]
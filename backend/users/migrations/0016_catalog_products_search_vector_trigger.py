@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:50
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_catalogproduct_search_vector'),
+    ]
+
+    operations = [
+        # search_vector is set per row as products are inserted or renamed,
+        # so loads write it in the same statement instead of a later
+        # whole-table UPDATE. Vectors of the existing catalog are filled here.
+        migrations.RunSQL(
+            sql="""
+                CREATE FUNCTION catalog_search_vector(
+                    name text, main_category text, sub_category text, lowest_category text
+                ) RETURNS tsvector AS $$
+                    SELECT setweight(to_tsvector('turkish', coalesce(name, '')), 'A')
+                        || setweight(to_tsvector('turkish', concat_ws(' ', main_category, sub_category, lowest_category)), 'B')
+                $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+                CREATE FUNCTION catalog_products_search_vector_update() RETURNS trigger AS $$
+                BEGIN
+                    NEW.search_vector := catalog_search_vector(
+                        NEW.name, NEW.main_category, NEW.sub_category, NEW.lowest_category
+                    );
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER catalog_products_search_vector
+                    BEFORE INSERT OR UPDATE OF name, main_category, sub_category, lowest_category
+                    ON catalog_products
+                    FOR EACH ROW EXECUTE FUNCTION catalog_products_search_vector_update();
+
+                UPDATE catalog_products
+                SET search_vector = catalog_search_vector(name, main_category, sub_category, lowest_category)
+                WHERE search_vector IS NULL;
+            """,
+            reverse_sql="""
+                DROP TRIGGER catalog_products_search_vector ON catalog_products;
+                DROP FUNCTION catalog_products_search_vector_update();
+                DROP FUNCTION catalog_search_vector(text, text, text, text);
+            """,
+        ),
+    ]
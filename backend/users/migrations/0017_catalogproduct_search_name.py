@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:30
+
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_catalog_products_search_vector_trigger'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        # The name as users type it: without diacritics ("cikolata" for
+        # "çikolata") and lower case. Unaccenting first folds İ and ı to i.
+        # unaccent() is only STABLE, so it is wrapped to be usable in a
+        # generated column; the dictionary is named explicitly to make that safe.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""
+                        CREATE FUNCTION catalog_search_name(value text) RETURNS text AS $$
+                            SELECT lower(public.unaccent('public.unaccent'::regdictionary, value))
+                        $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+                        ALTER TABLE catalog_products
+                            ADD COLUMN search_name text GENERATED ALWAYS AS (catalog_search_name(name)) STORED;
+                        CREATE INDEX catalog_products_search_name_trgm_idx
+                            ON catalog_products USING gin (search_name gin_trgm_ops);
+                    """,
+                    reverse_sql="""
+                        ALTER TABLE catalog_products DROP COLUMN search_name;
+                        DROP FUNCTION catalog_search_name(text);
+                    """,
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='catalogproduct',
+                    name='search_name',
+                    field=models.TextField(editable=False, null=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_catalogproduct_search_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.TextField()),
+                ('brand', models.TextField()),
+                ('size', models.TextField(blank=True)),
+                ('market_count', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'canonical_products',
+            },
+        ),
+        # Indexed for looking up every market's row of a set of canonical products
+        # with their prices (basket comparison)
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""
+                        ALTER TABLE catalog_products ADD COLUMN canonical_product_id bigint;
+                        CREATE INDEX catalog_products_canonical_product_idx
+                            ON catalog_products (canonical_product_id, market, price_kurus);
+                    """,
+                    reverse_sql="""
+                        DROP INDEX catalog_products_canonical_product_idx;
+                        ALTER TABLE catalog_products DROP COLUMN canonical_product_id;
+                    """,
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='catalogproduct',
+                    name='canonical_product',
+                    field=models.ForeignKey(
+                        blank=True, db_constraint=False, null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING, related_name='products',
+                        to='users.canonicalproduct',
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_canonicalproduct'),
+    ]
+
+    operations = [
+        # Exact lookups of a name as users type it (basket comparison). The
+        # trigram index can answer them too, but has to intersect the posting
+        # lists of every trigram of the name, which are long for common words.
+        migrations.RunSQL(
+            sql="CREATE INDEX catalog_products_search_name_idx ON catalog_products (search_name);",
+            reverse_sql="DROP INDEX catalog_products_search_name_idx;",
+        ),
+    ]
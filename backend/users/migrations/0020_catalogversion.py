@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_catalog_products_search_name_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField()),
+                ('loaded_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'catalog_version',
+            },
+        ),
+        migrations.RunSQL(
+            sql="INSERT INTO catalog_version (version, loaded_at) VALUES (1, now());",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
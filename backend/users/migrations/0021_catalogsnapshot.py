@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-19 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_catalogversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogSnapshot',
+            fields=[
+                ('name', models.TextField(primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+                ('body', models.BinaryField()),
+                ('gzip_body', models.BinaryField()),
+                ('digest', models.TextField()),
+            ],
+            options={
+                'db_table': 'catalog_snapshots',
+            },
+        ),
+    ]
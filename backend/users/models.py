@@ -1,6 +1,11 @@
 from django.db import models
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
 
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
+
+from .fields import KurusField
 
 
 class Product(models.Model):
@@ -151,7 +156,205 @@ class CarrefourProduct(models.Model):
 
     class Meta:
         db_table = 'carrefour_3_products'
-        
+
+
+class Category(models.Model):
+    """Normalized category shared by every market, e.g. fruits_vegetables."""
+    key = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=100)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        db_table = 'categories'
+
+class MarketCategory(models.Model):
+    """Maps a market's own main_category to its normalized category."""
+    market = models.CharField(max_length=50)
+    name = models.CharField(max_length=255)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='market_categories')
+
+    def __str__(self):
+        return f"{self.market}: {self.name} -> {self.category_id}"
+
+    class Meta:
+        db_table = 'market_categories'
+        unique_together = [('market', 'name')]
+
+
+# Markets served by the API: (slug, display name, source table model), in the
+# order the catalog endpoints list them. Adding a market only needs a new entry
+# here; refresh_catalog creates its partition of catalog_products.
+MARKETS = (
+    ('mopas', 'Mopas', MopasProduct),
+    ('migros', 'Migros', MigrosProduct),
+    ('sokmarket', 'Şok Market', SokmarketProduct),
+    ('marketpaketi', 'Market Paketi', MarketpaketiProduct),
+    ('carrefour', 'Carrefour', CarrefourProduct),
+    ('a101', 'A101', A101Product),
+)
+
+MARKET_DISPLAY_NAMES = {slug: display_name for slug, display_name, _ in MARKETS}
+
+
+# (high_price - price) / high_price, computed in floating point from the kuruş columns
+DISCOUNT_RATIO = Cast(F('high_price') - F('price'), FloatField()) / Cast('high_price', FloatField())
+
+
+class CatalogProductQuerySet(models.QuerySet):
+    def for_market(self, market):
+        return self.filter(market=market)
+
+    def priced(self):
+        return self.filter(price__isnull=False)
+
+    def discounted(self):
+        """Products priced below their high_price, annotated with their discount ratio.
+
+        Filter and ratio match the partial index catalog_products_discount_idx,
+        so ordering by -discount_ratio with a LIMIT is an index scan.
+        """
+        return self.filter(price__lt=F('high_price')).annotate(discount_ratio=DISCOUNT_RATIO)
+
+    def with_discount_ratio(self):
+        """Every product annotated with its discount ratio, 0 for products that are not discounted."""
+        return self.annotate(
+            discount_ratio=Case(When(price__lt=F('high_price'), then=DISCOUNT_RATIO), default=Value(0.0))
+        )
+
+
+class CatalogVersion(models.Model):
+    """The catalog's version: a single row, bumped by every load (refresh_catalog) and match (match_products).
+
+    The read-only catalog endpoints use it as their ETag and Last-Modified,
+    so clients revalidate them without the catalog being queried.
+    """
+    version = models.BigIntegerField()
+    loaded_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Catalog version {self.version}"
+
+    class Meta:
+        db_table = 'catalog_version'
+
+
+class CatalogSnapshot(models.Model):
+    """A catalog endpoint's JSON response, rendered once per catalog version after each load.
+
+    Written by homepage.render_snapshots(); served as stored, plain or
+    gzip-compressed, for the catalog version it was rendered from.
+    """
+    name = models.TextField(primary_key=True)
+    version = models.BigIntegerField()
+    body = models.BinaryField()
+    gzip_body = models.BinaryField()
+    # Hash of body; the responses' ETags are derived from it
+    digest = models.TextField()
+
+    def __str__(self):
+        return f"{self.name} (catalog version {self.version})"
+
+    class Meta:
+        db_table = 'catalog_snapshots'
+
+
+class CanonicalProduct(models.Model):
+    """One product as sold by one or more markets, e.g. every market's "Sütaş Süt 1 L".
+
+    Rebuilt with the catalog_products.canonical_product_id links by the
+    match_products command (users/matching.py) after every load. A product
+    keeps its id across runs as long as most of its market products stay
+    matched together.
+    """
+    name = models.TextField()
+    brand = models.TextField()
+    # Normalized package size, e.g. "1000 ml" or "500 g"; empty for names without one
+    size = models.TextField(blank=True)
+    market_count = models.IntegerField()
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        db_table = 'canonical_products'
+
+
+class CatalogProduct(models.Model):
+    """Every market's products in one table, list-partitioned by market.
+
+    The table is created by migration 0006 and filled from the per-market
+    tables by the refresh_catalog command, so Django does not manage it.
+    Unlike the per-market tables the columns are typed: prices are integer
+    kuruş, in_stock a boolean and date a real date; the market's display
+    name comes from MARKETS instead of being stored on every row.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    market = models.TextField()
+    source_id = models.BigIntegerField()
+    main_category = models.TextField()
+    sub_category = models.TextField()
+    lowest_category = models.TextField()
+    name = models.TextField()
+    price = KurusField(db_column='price_kurus')
+    high_price = KurusField(db_column='high_price_kurus', null=True, blank=True)
+    in_stock = models.BooleanField()
+    product_link = models.TextField()
+    page_link = models.TextField()
+    image_url = models.TextField()
+    # NULL when the scraped date could not be parsed
+    date = models.DateField(null=True, blank=True)
+    # Set by refresh_catalog from market_categories; NULL for categories without a mapping
+    category = models.ForeignKey(
+        Category, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    # Turkish full-text vector of name and categories, GIN-indexed and set by a trigger (migration 0016)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Lower-case name without diacritics, generated by the database; trigram-indexed for fuzzy search
+    search_name = models.TextField(null=True, editable=False)
+    # The same product in every market, set by match_products; NULL until the catalog is matched
+    canonical_product = models.ForeignKey(
+        CanonicalProduct, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False,
+        related_name='products'
+    )
+
+    objects = CatalogProductQuerySet.as_manager()
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        managed = False
+        db_table = 'catalog_products'
+
+class Deal(models.Model):
+    """A discounted catalog product. The table is rebuilt by refresh_catalog after every load."""
+    market = models.TextField()
+    source_id = models.BigIntegerField()
+    name = models.TextField()
+    price = KurusField(db_column='price_kurus')
+    high_price = KurusField(db_column='high_price_kurus')
+    image_url = models.TextField()
+    product_link = models.TextField()
+    main_category = models.TextField()
+    sub_category = models.TextField()
+    lowest_category = models.TextField()
+    category = models.TextField()
+    discount_ratio = models.FloatField()
+    discount_percentage = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.name} (-{self.discount_percentage}%)"
+
+    class Meta:
+        db_table = 'deals'
+        indexes = [
+            models.Index(fields=['-discount_ratio', '-id'], name='deals_discount_idx'),
+            models.Index(fields=['category', '-discount_ratio', '-id'], name='deals_category_discount_idx'),
+            models.Index(fields=['market', '-discount_ratio', '-id'], name='deals_market_discount_idx'),
+        ]
+
 class UserPhoneNumber(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
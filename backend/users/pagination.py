@@ -0,0 +1,154 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection, models
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Keyset pagination over the columns in `ordering`.
+
+    Each page continues from the last row of the previous one with a row
+    comparison that an index on `ordering` serves, so no OFFSET is used and
+    every page costs the same. The cursor is an opaque base64 token. Rows
+    with a NULL ordering column cannot be placed in the order and are skipped.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('id',)
+    descending = False
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.CATALOG_PAGE_SIZE
+        return max(1, min(page_size, settings.CATALOG_MAX_PAGE_SIZE))
+
+    def encode_cursor(self, row):
+        if isinstance(row, dict):  # rows of a values() queryset
+            position = json.dumps([row[field] for field in self.ordering])
+        else:
+            position = json.dumps([getattr(row, field) for field in self.ordering])
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(position, list) or len(position) != len(self.ordering)
+            or not all(isinstance(value, (str, int, float)) for value in position)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def filter_after(self, queryset, position):
+        """Rows that come after `position` in the ordering."""
+        # The row comparison is raw SQL, so compare column values (e.g. kuruş, not lira)
+        fields = [queryset.model._meta.get_field(field) for field in self.ordering]
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(position))
+        operator = '<' if self.descending else '>'
+        try:
+            params = [field.get_db_prep_value(value, connection) for field, value in zip(fields, position)]
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return queryset.filter(RawSQL(
+            f'({columns}) {operator} ({placeholders})', params, output_field=models.BooleanField()
+        ))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.filter(**{f'{field}__isnull': False for field in self.ordering})
+        queryset = queryset.order_by(*(f'-{field}' if self.descending else field for field in self.ordering))
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = self.filter_after(queryset, position)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+
+class CatalogKeysetPagination(KeysetPagination):
+    """catalog_products pages in (market, price, id) order."""
+    ordering = ('market', 'price', 'id')
+
+
+class DealKeysetPagination(KeysetPagination):
+    """Deals pages, largest discount first."""
+    ordering = ('discount_ratio', 'id')
+    descending = True
+
+
+class SearchPagination(KeysetPagination):
+    """Search result pages of at most ?limit= rows, ordered by one of SORTS.
+
+    The ordering can include annotations (relevance, discount_ratio), which
+    raw SQL cannot name, so the position is compared with lookups instead of
+    a row comparison. Search results are ranked after the index lookup
+    anyway, so no ordering index is lost.
+    """
+    page_size_query_param = 'limit'
+    default_page_size = 50
+    max_page_size = 200
+    # sort option -> (ordering, descending)
+    SORTS = {
+        'relevance': (('relevance', 'id'), True),
+        'price': (('price', 'id'), False),
+        'discount': (('discount_ratio', 'id'), True),
+    }
+
+    def __init__(self, sort='relevance'):
+        self.ordering, self.descending = self.SORTS[sort]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.default_page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def filter_after(self, queryset, position):
+        # (a, b) after (x, y): a beyond x, or a = x and b beyond y
+        lookup = 'lt' if self.descending else 'gt'
+        after = Q()
+        for index, field in enumerate(self.ordering):
+            after |= Q(**{field: value for field, value in zip(self.ordering[:index], position)},
+                       **{f'{field}__{lookup}': position[index]})
+        return queryset.filter(after)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
@@ -0,0 +1,169 @@
+"""Catalog responses cached in each worker's memory and in Redis, shared by every worker and node.
+
+Redis entries are keyed by the catalog version (as the Django cache key
+version), so a load invalidates all of them at once by bumping it: no
+worker looks the old keys up again, and they expire on their own.
+"""
+import functools
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.http import http_date
+
+from . import catalog_version
+from .local_cache import COMPUTED, LocalCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'catalog'
+
+# Seconds a response is kept when an endpoint has no CATALOG_CACHE_TIMEOUTS entry
+DEFAULT_TIMEOUT = 600
+
+
+def response_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _response_key(name, request):
+    # The browsable API and JSON renderings of one URL are different responses, and a
+    # view may answer in an encoding the request accepts
+    variant = "\n".join([
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        request.META.get('HTTP_ACCEPT_ENCODING', ''),
+    ])
+    return f"response:{name}:{hashlib.sha256(variant.encode()).hexdigest()[:32]}"
+
+
+def _count(name, outcome):
+    key = f"stats:{name}:{outcome}"
+    cache = response_cache()
+    try:
+        cache.incr(key, version=0)
+    except ValueError:
+        # First request of the endpoint; add() loses no count to a concurrent first one
+        if not cache.add(key, 1, timeout=None, version=0):
+            cache.incr(key, version=0)
+
+
+def cache_stats(names):
+    """{name: {'hits': n, 'misses': n}} of the counters kept by cached_response()."""
+    keys = {(name, outcome): f"stats:{name}:{outcome}" for name in names for outcome in ('hit', 'miss')}
+    counts = response_cache().get_many(keys.values(), version=0)
+    return {
+        name: {
+            'hits': counts.get(keys[name, 'hit'], 0),
+            'misses': counts.get(keys[name, 'miss'], 0),
+        }
+        for name in names
+    }
+
+
+def _shared_get(name, key, version):
+    try:
+        cached = response_cache().get(key, version=version[0])
+        _count(name, 'hit' if cached is not None else 'miss')
+        return cached
+    except Exception:
+        logger.exception(f"Catalog response cache lookup failed ({name})")
+        return None
+
+
+def _shared_set(name, key, version, cached):
+    try:
+        response_cache().set(
+            key, cached, timeout=settings.CATALOG_CACHE_TIMEOUTS.get(name, DEFAULT_TIMEOUT), version=version[0]
+        )
+    except Exception:
+        logger.exception(f"Catalog response cache store failed ({name})")
+
+
+def _shareable(response):
+    # A view that encodes its body or validates it with a strong ETag (SerializedBody)
+    # answers each request itself: the copy stored for one request could not be
+    # decoded by, or revalidated for, another
+    etag = response.get('ETag')
+    return not response.has_header('Content-Encoding') and (etag is None or etag.startswith('W/'))
+
+
+_local_cache = None
+
+
+def local_cache():
+    """This worker's LRU of cached responses, sized by CATALOG_LOCAL_CACHE_BYTES (0 stores none)."""
+    global _local_cache
+    if _local_cache is None or _local_cache.max_bytes != settings.CATALOG_LOCAL_CACHE_BYTES:
+        _local_cache = LocalCache(settings.CATALOG_LOCAL_CACHE_BYTES, sizeof=lambda cached: len(cached[2]))
+    return _local_cache
+
+
+def cached_response(name):
+    """Serve a read-only catalog view from the caches of the current catalog version.
+
+    Successful GET responses are kept under the request's full path,
+    Accept and Accept-Encoding headers, first in this worker's LRU
+    (local_cache()), then in the shared cache for
+    CATALOG_CACHE_TIMEOUTS[name] seconds; streaming responses and those
+    with a Content-Encoding or a strong ETag are not. Concurrent requests
+    for a response that neither holds wait for one of them to compute
+    it. After a load the worker keeps serving the previous version's
+    response, with that version's ETag, while it is refreshed in the
+    background.
+
+    Responses carry X-Cache: HIT, STALE or MISS, and each shared cache
+    lookup counts towards the endpoint's hit/miss counters. When the
+    shared cache cannot be reached, the view answers uncached.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def cached_view(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            version = catalog_version.get_version() or catalog_version.refresh()
+            key = _response_key(name, request)
+            computed = {}
+
+            def compute():
+                cached = _shared_get(name, key, version)
+                if cached is not None:
+                    return cached
+                response = computed['response'] = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming or not _shareable(response):
+                    return None
+                if hasattr(response, 'render'):
+                    # DRF responses are rendered by the handler otherwise, after this returns
+                    response.render()
+                cached = (response.status_code, list(response.items()), response.content)
+                _shared_set(name, key, version, cached)
+                return cached
+
+            outcome, cached_version, cached = local_cache().get(key, version, compute)
+            if outcome == COMPUTED and 'response' in computed:
+                response = computed['response']
+                response['X-Cache'] = 'MISS'
+                return response
+            if cached is None:
+                # The concurrent request computing it got a response not to share (e.g. an error)
+                response = view(request, *args, **kwargs)
+                response['X-Cache'] = 'MISS'
+                return response
+
+            status, headers, content = cached
+            response = HttpResponse(content, status=status)
+            for header, value in headers:
+                response[header] = value
+            if cached_version != version:
+                # Validated as what it is, the previous version's response
+                response['ETag'] = catalog_version.version_etag(cached_version)
+                response['Last-Modified'] = http_date(cached_version[1].timestamp())
+                response['X-Cache'] = 'STALE'
+            else:
+                response['X-Cache'] = 'HIT'
+            return response
+        return cached_view
+    return decorator
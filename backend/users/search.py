@@ -0,0 +1,64 @@
+import json
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, FloatField, Func, TextField, Value
+from django.db.models.functions import Cast
+
+from .catalog import SEARCH_CONFIG
+from .models import CatalogProduct
+
+
+class SearchName(Func):
+    """The database's normalization of catalog_products.search_name, applied to a query."""
+    function = 'catalog_search_name'
+    output_field = TextField()
+
+
+# Search totals are counted exactly up to this many matches, and estimated beyond
+EXACT_COUNT_LIMIT = 1000
+
+
+def text_search(query):
+    """Catalog products matching `query` in full text, annotated with their ts_rank relevance."""
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    return CatalogProduct.objects.filter(search_vector=search_query).annotate(
+        # ts_rank is a real; as double precision its value survives the JSON
+        # round trip of a pagination cursor exactly
+        relevance=Cast(SearchRank(F('search_vector'), search_query), FloatField())
+    )
+
+
+def fuzzy_search(query):
+    """Catalog products whose name contains a word similar to `query`, annotated with the similarity as relevance.
+
+    Tolerates missing diacritics, case and small typos ("sut", "cikolata").
+    The `<%` operator behind trigram_word_similar is what the trigram index
+    serves; its cut-off is pg_trgm.word_similarity_threshold, set here from
+    SEARCH_FUZZY_THRESHOLD for the current connection.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)",
+            [str(settings.SEARCH_FUZZY_THRESHOLD)],
+        )
+    normalized = SearchName(Value(query))
+    return CatalogProduct.objects.filter(search_name__trigram_word_similar=normalized).annotate(
+        # A real too, cast for the pagination cursor like text_search's rank
+        relevance=Cast(TrigramWordSimilarity(normalized, 'search_name'), FloatField())
+    )
+
+
+def estimated_total(queryset):
+    """Number of search matches: exact below EXACT_COUNT_LIMIT, the planner's estimate above.
+
+    The exact count stops reading at the limit, so it never costs more than
+    fetching EXACT_COUNT_LIMIT rows.
+    """
+    queryset = queryset.order_by()
+    count = queryset[:EXACT_COUNT_LIMIT].count()
+    if count < EXACT_COUNT_LIMIT:
+        return count
+    plan = json.loads(queryset.explain(format='json'))
+    return max(count, int(plan[0]['Plan']['Plan Rows']))
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import A101Product, FavoriteCart, Product, FavoriteCartProduct, MopasProduct, MigrosProduct, SokmarketProduct, MarketpaketiProduct, CarrefourProduct,  UserAddress, ShoppingList,ShoppingListItem
+from .models import MARKET_DISPLAY_NAMES, A101Product, CatalogProduct, Deal, FavoriteCart, Product, FavoriteCartProduct, MopasProduct, MigrosProduct, SokmarketProduct, MarketpaketiProduct, CarrefourProduct,  UserAddress, ShoppingList,ShoppingListItem
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -53,6 +53,43 @@ class CarrefourProductSerializer(serializers.ModelSerializer):
         model = CarrefourProduct
         fields = '__all__'
         
+class CatalogProductSerializer(serializers.ModelSerializer):
+    # Clients know products by their id in the market's own table
+    id = serializers.IntegerField(source='source_id')
+    category_id = serializers.IntegerField(read_only=True)
+    # Prices are stored in kuruş but read as lira
+    price = serializers.FloatField()
+    high_price = serializers.FloatField(allow_null=True)
+    market_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CatalogProduct
+        exclude = ['source_id', 'category', 'search_vector', 'search_name']
+
+    def get_market_name(self, obj):
+        return MARKET_DISPLAY_NAMES.get(obj.market, obj.market)
+
+class DiscountedProductSerializer(CatalogProductSerializer):
+    discount_percentage = serializers.IntegerField()
+    image = serializers.CharField(source='image_url')
+    category = serializers.CharField(source='category_label')
+
+    class Meta(CatalogProductSerializer.Meta):
+        exclude = ['source_id', 'search_vector', 'search_name']
+
+class DealSerializer(serializers.ModelSerializer):
+    id = serializers.CharField(source='source_id')
+    market_name = serializers.CharField(source='market')
+    price = serializers.FloatField()
+    high_price = serializers.FloatField()
+
+    class Meta:
+        model = Deal
+        fields = [
+            'id', 'name', 'price', 'image_url', 'main_category', 'sub_category', 'lowest_category',
+            'market_name', 'high_price', 'product_link', 'category', 'discount_percentage',
+        ]
+
 class FavoriteCartProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = FavoriteCartProduct
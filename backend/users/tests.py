@@ -1,3 +1,739 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import threading
+import warnings
+from datetime import date
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+
+from . import autocomplete, catalog_version, homepage, invalidation, responses, views
+from .catalog import cheapest_per_category, ensure_partitions, refresh_deals
+from .concurrency import query_pool, query_pool_view
+from .local_cache import COMPUTED, HIT, STALE, LocalCache
+from .matching import canonical_ids, find_matches, normalize
+from .models import MARKETS, CatalogProduct, Category, Deal, MarketCategory
+from .response_cache import cache_stats, cached_response
+from .responses import SerializedBody
+
+# Catalog responses are not cached by tests of what the views do, nor is Redis needed for them
+UNCACHED = {
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'catalog': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    },
+    'CATALOG_LOCAL_CACHE_BYTES': 0,
+}
+
+# Values of the catalog_products columns a fixture row leaves out (the others are NULL)
+CATALOG_PRODUCT_DEFAULTS = {
+    'main_category': '', 'sub_category': '', 'lowest_category': '', 'in_stock': True,
+    'product_link': '', 'page_link': '', 'image_url': '',
+}
+
+
+def insert_catalog_products(rows, batch_size=5000):
+    """Inserts catalog_products rows, given as dicts of column values, creating the market partitions first."""
+    rows = [{**CATALOG_PRODUCT_DEFAULTS, **row} for row in rows]
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    placeholders = f"({', '.join(['%s'] * len(columns))})"
+    with connection.cursor() as cursor:
+        ensure_partitions(cursor)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f"INSERT INTO {CatalogProduct._meta.db_table} ({', '.join(columns)}) "
+                f"VALUES {', '.join([placeholders] * len(batch))}",
+                [row.get(column) for row in batch for column in columns],
+            )
+
+
+# Pool threads use their own connections, which cannot see the test transaction
+@override_settings(CATALOG_QUERY_WORKERS=0)
+class CatalogTestCase(TestCase):
+    """Runs the catalog views' queries on the test's thread, without home page snapshots left by other tests."""
+
+    def setUp(self):
+        super().setUp()
+        # Snapshots are held per worker, and versions repeat once a test's transaction is rolled back
+        for snapshot in homepage.snapshot_responses.values():
+            snapshot.clear()
+
+
+@override_settings(**UNCACHED)
+class FilteredProductListQueryPlanTests(CatalogTestCase):
+    """The category-filtered catalog path must be served by an index, never a sequential scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        markets = [market for market, _, _ in MARKETS]
+        category_ids = list(Category.objects.values_list('id', flat=True))
+        insert_catalog_products(
+            {
+                'market': markets[i % len(markets)], 'source_id': i, 'category_id': category_ids[i % len(category_ids)],
+                'main_category': f'Kategori {i % 40}', 'name': f'Ürün {i}', 'price_kurus': (i % 997) * 100 + 50,
+                'date': date.today(),
+            }
+            for i in range(1, 60001)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {CatalogProduct._meta.db_table}")
+
+    def catalog_query_plans(self, url):
+        """Requests a page and its next page, returning the EXPLAIN output of each catalog query."""
+        plans = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            for query in queries:
+                if CatalogProduct._meta.db_table in query['sql']:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"EXPLAIN {query['sql']}")
+                        plans.append('\n'.join(row[0] for row in cursor.fetchall()))
+            url = response.json()['next']
+        return plans
+
+    def assertIndexOnly(self, plans):
+        self.assertEqual(len(plans), 2)
+        for plan in plans:
+            self.assertNotIn('Seq Scan', plan, plan)
+            self.assertIn('Index', plan, plan)
+
+    def test_normalized_category_uses_index(self):
+        self.assertIndexOnly(self.catalog_query_plans('/api/products/filtered/?category=temel+g%C4%B1da'))
+
+    def test_normalized_category_label_uses_index(self):
+        self.assertIndexOnly(self.catalog_query_plans('/api/products/filtered/?category=TEMEL+GIDA'))
+
+    def test_market_category_uses_index(self):
+        self.assertIndexOnly(self.catalog_query_plans('/api/products/filtered/?category=Kategori+7'))
+
+
+@override_settings(**UNCACHED)
+class KeysetPaginationTests(CatalogTestCase):
+    """Following `next` visits every priced product once, in (market, price, id) order."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category_id = Category.objects.values_list('id', flat=True)[0]
+        # Four prices with kuruş (10.00 to 13.75), so pages end inside runs of equal prices
+        insert_catalog_products(
+            {
+                'market': ['migros', 'a101', 'sokmarket'][i % 3], 'source_id': i,
+                'category_id': category_id if i % 2 == 0 else None, 'main_category': f'Kategori {i % 5}',
+                'name': f'Ürün {i}', 'price_kurus': None if i % 11 == 0 else 1000 + (i % 4) * 125, 'in_stock': i % 3 != 1,
+            }
+            for i in range(1, 61)
+        )
+
+    def walk(self, url, params):
+        """The ids of every page's products, following `next` from the first page."""
+        response = self.client.get(url, params)
+        ids = []
+        # A cursor that does not move on would page forever; stop once more rows were seen than exist
+        while len(ids) <= CatalogProduct.objects.count():
+            self.assertEqual(response.status_code, 200, response.content)
+            page = response.json()
+            ids.extend(product['id'] for product in page['results'])
+            if page['next'] is None:
+                break
+            response = self.client.get(page['next'])
+        return ids
+
+    def expected(self, products):
+        return list(products.priced().order_by('market', 'price', 'id').values_list('source_id', flat=True))
+
+    def test_products_pages(self):
+        ids = self.walk('/api/products/', {'page_size': 7})
+        self.assertEqual(ids, self.expected(CatalogProduct.objects.all()))
+        self.assertEqual(len(ids), 60 - 5)
+
+    def test_filtered_products_pages(self):
+        ids = self.walk('/api/products/filtered/', {'category': 'Kategori 2', 'in_stock': 'true', 'page_size': 2})
+        self.assertEqual(ids, self.expected(CatalogProduct.objects.filter(main_category='Kategori 2', in_stock=True)))
+        self.assertTrue(ids)
+
+    def test_cursor_holds_the_last_position_in_lira(self):
+        page = self.client.get('/api/products/', {'page_size': 5}).json()
+        last = page['results'][-1]
+        cursor = parse_qs(urlsplit(page['next']).query)['cursor'][0]
+        position = json.loads(base64.urlsafe_b64decode(cursor))
+        product = CatalogProduct.objects.get(source_id=last['id'])
+        self.assertEqual(position, [product.market, last['price'], product.id])
+        self.assertIsInstance(position[1], float)
+
+    def test_search_columns_are_not_read(self):
+        for url in ('/api/products/', '/api/products/filtered/'):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            catalog_queries = [query['sql'] for query in queries if CatalogProduct._meta.db_table in query['sql']]
+            self.assertTrue(catalog_queries)
+            for sql in catalog_queries:
+                self.assertNotIn('search_vector', sql)
+                self.assertNotIn('search_name', sql)
+
+    def test_invalid_cursor_is_rejected(self):
+        def encode(position):
+            return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+        for cursor in ['not a cursor', encode({'market': 'migros'}), encode(['migros', 10.0]),
+                       encode(['migros', None, 1]), encode(['migros', 'ucuz', 1])]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/products/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+
+@override_settings(**UNCACHED)
+class DealsTests(CatalogTestCase):
+    """refresh_deals fills each deals column from its catalog value, and /api/deals/ pages through them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.first()
+        # Every third product is not discounted; discounts repeat, so pages end inside runs of them
+        insert_catalog_products(
+            {
+                'market': ['migros', 'a101'][i % 2], 'source_id': 1000 + i,
+                'category_id': cls.category.id if i % 4 == 1 else None,
+                'main_category': '' if i % 5 == 0 else f'Kategori {i % 3}',
+                'sub_category': f'Alt {i}', 'lowest_category': f'En alt {i}', 'name': f'Ürün {i}',
+                'price_kurus': 1000 - (i % 4) * 150, 'high_price_kurus': None if i % 3 == 0 else 1000,
+                'product_link': f'https://example.com/{i}', 'image_url': f'https://example.com/{i}.jpg',
+            }
+            for i in range(1, 41)
+        )
+        with connection.cursor() as cursor:
+            cls.count = refresh_deals(cursor)
+
+    def walk(self, params):
+        response = self.client.get('/api/deals/', params)
+        deals = []
+        while len(deals) <= self.count:
+            self.assertEqual(response.status_code, 200, response.content)
+            page = response.json()
+            deals.extend(page['results'])
+            if page['next'] is None:
+                break
+            response = self.client.get(page['next'])
+        return deals
+
+    def expected(self, product):
+        return {
+            'id': str(product.source_id),
+            'name': product.name,
+            'price': product.price,
+            'image_url': product.image_url,
+            'main_category': product.main_category,
+            'sub_category': product.sub_category,
+            'lowest_category': product.lowest_category,
+            'market_name': product.market,
+            'high_price': product.high_price,
+            'product_link': product.product_link,
+            'category': self.category.name if product.category_id else product.main_category or 'Genel',
+            'discount_percentage': round((product.high_price - product.price) / product.high_price * 100),
+        }
+
+    def test_deals_pages(self):
+        discounted = CatalogProduct.objects.discounted().order_by('-discount_ratio', 'name')
+        self.assertEqual(self.count, len(discounted))
+
+        deals = self.walk({'page_size': 4})
+        self.assertEqual(
+            sorted(deals, key=lambda deal: (-deal['discount_percentage'], deal['name'])),
+            [self.expected(product) for product in discounted],
+        )
+        # Largest discount first, with ties in reverse deals id (insertion) order
+        self.assertEqual(
+            [deal['id'] for deal in deals],
+            [str(source_id) for source_id in Deal.objects.order_by('-discount_ratio', '-id').values_list('source_id', flat=True)],
+        )
+
+    def test_filtered_deals_pages(self):
+        deals = self.walk({'page_size': 2, 'market': 'a101', 'category': self.category.name})
+        self.assertTrue(deals)
+        self.assertEqual(
+            sorted(int(deal['id']) for deal in deals),
+            sorted(CatalogProduct.objects.discounted().filter(market='a101', category=self.category).values_list('source_id', flat=True)),
+        )
+
+
+@override_settings(**UNCACHED)
+class SearchProductsTests(CatalogTestCase):
+    """Queries typed without Turkish diacritics still find products."""
+
+    @classmethod
+    def setUpTestData(cls):
+        insert_catalog_products([
+            {'market': 'migros', 'source_id': 1, 'main_category': 'Süt Ürünleri', 'sub_category': 'Süt',
+             'lowest_category': 'Süt', 'name': 'Pınar Tam Yağlı Süt 1 L', 'price_kurus': 3995},
+            {'market': 'a101', 'source_id': 2, 'main_category': 'Atıştırmalık', 'sub_category': 'Çikolata',
+             'lowest_category': 'Tablet', 'name': 'Ülker Sütlü Çikolata 80 g', 'price_kurus': 2450},
+            {'market': 'sokmarket', 'source_id': 3, 'main_category': 'Temel Gıda', 'sub_category': 'Bakliyat',
+             'lowest_category': 'Pirinç', 'name': 'Baldo Pirinç 1 kg', 'price_kurus': 8990},
+        ])
+
+    def search(self, **params):
+        response = self.client.get('/api/search/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [product['name'] for product in response.json()]
+
+    def test_text_search(self):
+        self.assertEqual(self.search(q='süt')[0], 'Pınar Tam Yağlı Süt 1 L')
+
+    def test_query_without_diacritics_falls_back_to_fuzzy(self):
+        self.assertEqual(self.search(q='cikolata'), ['Ülker Sütlü Çikolata 80 g'])
+
+    def test_fuzzy_mode(self):
+        self.assertIn('Pınar Tam Yağlı Süt 1 L', self.search(q='SUT', mode='fuzzy'))
+        self.assertEqual(self.search(q='pirinc', mode='fuzzy'), ['Baldo Pirinç 1 kg'])
+
+
+@override_settings(CATALOG_STREAM_CHUNK_SIZE=2, **UNCACHED)
+class ProductStreamTests(CatalogTestCase):
+    """?stream=1 sends the catalog a chunk at a time, served over WSGI (gunicorn) or ASGI (daphne)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        insert_catalog_products(
+            {'market': 'migros', 'source_id': i, 'main_category': 'Temel Gıda', 'name': f'Ürün {i}', 'price_kurus': i * 100}
+            for i in range(1, 6)
+        )
+
+    async def test_asgi_stream_is_read_chunk_by_chunk(self):
+        response = await self.async_client.get('/api/products/', {'stream': '1'})
+        # Not a sync iterator, which Django would read whole before sending anything
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 3)
+        products = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        self.assertEqual(sorted(product['id'] for product in products), [1, 2, 3, 4, 5])
+
+    def test_wsgi_stream_is_read_chunk_by_chunk(self):
+        response = self.client.get('/api/products/', {'stream': '1'})
+        # Not an async iterator, which Django would read whole before sending anything
+        self.assertFalse(response.is_async)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 3)
+
+
+class CheapestPerCategoryTests(TestCase):
+    """Each (market, main_category) pair keeps its k cheapest priced products."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category_id = Category.objects.values_list('id', flat=True)[0]
+        MarketCategory.objects.create(market='migros', name='Kategori 1', category_id=category_id)
+        insert_catalog_products(
+            {
+                'market': ['migros', 'a101', 'sokmarket'][i % 3], 'source_id': i,
+                'category_id': category_id if i % 3 == 0 and i % 4 == 1 else None,
+                'main_category': f'Kategori {i % 4}', 'name': f'Ürün {i}',
+                'price_kurus': None if i % 7 == 0 else (i * 37) % 1000 + 100,
+            }
+            for i in range(1, 301)
+        )
+
+    def expected(self, k, keep=lambda product: True):
+        groups = {}
+        for product in CatalogProduct.objects.priced().order_by('price', 'id').values('market', 'main_category', 'name'):
+            if keep(product):
+                groups.setdefault((product['market'], product['main_category']), []).append(product['name'])
+        return sorted(name for names in groups.values() for name in names[:k])
+
+    def test_every_category(self):
+        products = cheapest_per_category(['name'], 3)
+        self.assertEqual(sorted(product['name'] for product in products), self.expected(3))
+
+    def test_one_category(self):
+        products = cheapest_per_category(['name', 'price'], 2, main_category='Kategori 2')
+        self.assertEqual(
+            sorted(product['name'] for product in products),
+            self.expected(2, lambda product: product['main_category'] == 'Kategori 2'),
+        )
+        self.assertIsInstance(products[0]['price'], float)
+
+    def test_mapped_categories(self):
+        products = cheapest_per_category(['name', 'category_id'], 2, mapped_only=True)
+        self.assertEqual({(product['market'], product['main_category']) for product in products}, {('migros', 'Kategori 1')})
+        self.assertEqual(len(products), 2)
+
+
+class CompareBasketTests(CatalogTestCase):
+    """Basket items are found in every market that sells the same canonical product."""
+
+    @classmethod
+    def setUpTestData(cls):
+        insert_catalog_products([
+            {'market': 'migros', 'source_id': 1, 'canonical_product_id': 1, 'main_category': 'Süt Ürünleri',
+             'name': 'Pınar Tam Yağlı Süt 1 L', 'price_kurus': 3995},
+            {'market': 'a101', 'source_id': 2, 'canonical_product_id': 1, 'main_category': 'Süt Ürünleri',
+             'name': 'PINAR TAM YAGLI SUT 1000 ML', 'price_kurus': 3750},
+            {'market': 'migros', 'source_id': 3, 'canonical_product_id': 2, 'main_category': 'Temel Gıda',
+             'name': 'Baldo Pirinç 1 kg', 'price_kurus': 8990},
+            {'market': 'sokmarket', 'source_id': 4, 'main_category': 'Atıştırmalık',
+             'name': 'Ülker Sütlü Çikolata 80 g', 'price_kurus': 2450},
+        ])
+
+    def compare(self, items):
+        return self.client.post('/api/basket/compare/', {'items': items}, content_type='application/json')
+
+    def test_items_by_name(self):
+        response = self.compare([{'name': 'pınar tam yağlı süt 1 l', 'quantity': 2}, {'name': 'Baldo Pirinç 1 kg'}])
+        self.assertEqual(response.status_code, 200, response.content)
+        migros, a101 = response.json()
+        self.assertEqual((migros['market'], migros['totalPrice'], migros['isComplete']), ('migros', 169.8, True))
+        self.assertEqual((a101['market'], a101['totalPrice'], a101['foundProducts']), ('a101', 75.0, 1))
+        self.assertEqual(a101['availableProducts'][0]['market_product_name'], 'PINAR TAM YAGLI SUT 1000 ML')
+
+    def test_items_by_canonical_product(self):
+        markets = [market['market'] for market in self.compare([{'canonical_product_id': 1}]).json()]
+        self.assertEqual(markets, ['a101', 'migros'])
+
+    def test_unmatched_product_by_name(self):
+        markets = [market['market'] for market in self.compare([{'name': 'Ulker Sutlu Cikolata 80 g'}]).json()]
+        self.assertEqual(markets, ['sokmarket'])
+
+    def test_invalid_items(self):
+        self.assertEqual(self.compare([]).status_code, 400)
+        self.assertEqual(self.compare([{'name': 'Süt', 'quantity': 0}]).status_code, 400)
+
+
+# A background version check would not see the test transaction either: versions are only read by the tests themselves
+@override_settings(CATALOG_VERSION_CHECK_INTERVAL=3600)
+class MarketsListTests(CatalogTestCase):
+    """The markets list is served from stored bytes and revalidated with its ETag."""
+
+    def setUp(self):
+        super().setUp()
+        self.load_catalog(3995)
+
+    def load_catalog(self, price_kurus):
+        CatalogProduct.objects.all().delete()
+        insert_catalog_products([
+            {'market': 'migros', 'source_id': 1, 'main_category': 'Süt Ürünleri',
+             'name': 'Pınar Tam Yağlı Süt 1 L', 'price_kurus': price_kurus},
+        ])
+        catalog_version.bump_version()
+        catalog_version.refresh()
+
+    def test_revalidation(self):
+        response = self.client.get('/api/markets-products/')
+        self.assertEqual(response.json()[0]['products'][0]['price'], 39.95)
+        revalidated = self.client.get('/api/markets-products/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+
+    def test_gzip(self):
+        plain = self.client.get('/api/markets-products/')
+        compressed = self.client.get('/api/markets-products/', headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+
+    def test_reload_changes_etag(self):
+        etag = self.client.get('/api/markets-products/')['ETag']
+        self.load_catalog(2995)
+        response = self.client.get('/api/markets-products/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['products'][0]['price'], 29.95)
+
+
+@override_settings(CATALOG_VERSION_CHECK_INTERVAL=3600, **UNCACHED)
+class CatalogConditionalTests(CatalogTestCase):
+    """Catalog endpoints are revalidated against the catalog version without querying."""
+
+    def setUp(self):
+        super().setUp()
+        catalog_version.refresh()
+
+    def test_revalidation_without_queries(self):
+        response = self.client.get('/api/cheapest-products/')
+        version, loaded_at = catalog_version.get_version()
+        self.assertEqual(response['ETag'], f'W/"catalog-{version}"')
+        self.assertEqual(response['Last-Modified'], http_date(loaded_at.timestamp()))
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        with self.assertNumQueries(0):
+            revalidated = self.client.get('/api/cheapest-products/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_failed_query_is_not_validated(self):
+        for url, build in (
+            ('/api/cheapest-products/', 'cheapest_products'),
+            ('/api/cheapest-products-by-categories/', 'cheapest_products_by_categories'),
+        ):
+            with mock.patch.object(homepage, build, side_effect=OperationalError('statement timeout')):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 500)
+
+    def test_new_version_is_served_in_full(self):
+        etag = self.client.get('/api/deals/')['ETag']
+        catalog_version.bump_version()
+        catalog_version.refresh()
+        response = self.client.get('/api/deals/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@override_settings(CATALOG_VERSION_CHECK_INTERVAL=3600, **UNCACHED)
+class HomepageSnapshotTests(CatalogTestCase):
+    """Home page endpoints serve the latest snapshot, and query the catalog without a recent one."""
+
+    @classmethod
+    def setUpTestData(cls):
+        insert_catalog_products([
+            {'market': 'migros', 'source_id': 1, 'main_category': 'Süt Ürünleri',
+             'name': 'Pınar Tam Yağlı Süt 1 L', 'price_kurus': 3995, 'high_price_kurus': 4995},
+            {'market': 'sokmarket', 'source_id': 2, 'main_category': 'Temel Gıda',
+             'name': 'Baldo Pirinç 1 kg', 'price_kurus': 8990},
+        ])
+
+    def setUp(self):
+        super().setUp()
+        catalog_version.bump_version()
+        catalog_version.refresh()
+
+    def test_snapshot_is_served_from_memory(self):
+        live = self.client.get('/api/discounted-products/')
+        homepage.render_snapshots()
+        self.client.get('/api/discounted-products/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/discounted-products/')
+        self.assertEqual(response.content, live.content)
+        self.assertFalse(response['ETag'].startswith('W/'))
+        with self.assertNumQueries(0):
+            revalidated = self.client.get('/api/discounted-products/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+    @mock.patch.object(responses, 'SNAPSHOT_CHECK_INTERVAL', 0)
+    def test_previous_snapshot_is_served_until_the_new_one_is_rendered(self):
+        homepage.render_snapshots()
+        served = self.client.get('/api/cheapest-products/')
+        CatalogProduct.objects.filter(source_id=2).update(name='Baldo Pirinç 2 kg')
+        catalog_version.bump_version()
+        catalog_version.refresh()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/cheapest-products/')
+        self.assertEqual(response['ETag'], served['ETag'])
+        homepage.render_snapshots()
+        response = self.client.get('/api/cheapest-products/')
+        self.assertNotEqual(response['ETag'], served['ETag'])
+        self.assertEqual([product['name'] for product in response.json()], ['Pınar Tam Yağlı Süt 1 L', 'Baldo Pirinç 2 kg'])
+
+    @override_settings(CATALOG_SNAPSHOT_MAX_LAG=0)
+    def test_outdated_snapshot_is_not_served(self):
+        homepage.render_snapshots()
+        catalog_version.bump_version()
+        catalog_version.refresh()
+        response = self.client.get('/api/cheapest-products/')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertEqual([product['name'] for product in response.json()], ['Pınar Tam Yağlı Süt 1 L', 'Baldo Pirinç 1 kg'])
+
+    def test_other_limits_query_the_catalog(self):
+        homepage.render_snapshots()
+        response = self.client.get('/api/discounted-products/', {'limit': 10})
+        self.assertTrue(response['ETag'].startswith('W/'))
+
+
+# Without the per-worker layer, so that every request reaches the shared cache
+@override_settings(
+    CATALOG_VERSION_CHECK_INTERVAL=3600, CATALOG_LOCAL_CACHE_BYTES=0,
+    CACHES={**UNCACHED['CACHES'], 'catalog': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog-tests'}},
+)
+class ResponseCacheTests(CatalogTestCase):
+    """Catalog responses are shared through the cache until the catalog version changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        insert_catalog_products([
+            {'market': 'migros', 'source_id': 1, 'main_category': 'Süt Ürünleri', 'sub_category': 'Süt',
+             'lowest_category': 'Süt', 'name': 'Pınar Tam Yağlı Süt 1 L', 'price_kurus': 3995},
+        ])
+
+    def setUp(self):
+        super().setUp()
+        caches['catalog'].clear()
+        catalog_version.refresh()
+
+    def test_repeated_request_is_served_from_the_cache(self):
+        response = self.client.get('/api/search/', {'q': 'süt'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/search/', {'q': 'süt'})
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['Content-Type'], response['Content-Type'])
+        self.assertEqual(cache_stats(['search']), {'search': {'hits': 1, 'misses': 1}})
+
+    def test_new_version_misses(self):
+        self.client.get('/api/search/', {'q': 'süt'})
+        CatalogProduct.objects.filter(source_id=1).update(name='Pınar Yarım Yağlı Süt 1 L')
+        catalog_version.bump_version()
+        catalog_version.refresh()
+        response = self.client.get('/api/search/', {'q': 'süt'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()[0]['name'], 'Pınar Yarım Yağlı Süt 1 L')
+
+    @override_settings(CATALOG_LOCAL_CACHE_BYTES=1024 * 1024)
+    def test_failed_query_is_not_cached(self):
+        with mock.patch.object(views, 'cheapest_per_category', side_effect=OperationalError('statement timeout')):
+            failed = self.client.get('/api/cheapest-products-per-category/')
+        self.assertEqual(failed.status_code, 500)
+        response = self.client.get('/api/cheapest-products-per-category/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([product['name'] for product in response.json()], ['Pınar Tam Yağlı Süt 1 L'])
+
+    @override_settings(CATALOG_LOCAL_CACHE_BYTES=1024 * 1024)
+    def test_snapshot_encodings_are_not_shared(self):
+        homepage.render_snapshots()
+        gzipped = self.client.get('/api/discounted-products/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        plain = self.client.get('/api/discounted-products/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(plain.content, gzip.decompress(gzipped.content))
+        revalidated = self.client.get('/api/discounted-products/', headers={'If-None-Match': plain['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+    @override_settings(CATALOG_LOCAL_CACHE_BYTES=1024 * 1024)
+    def test_encoded_responses_are_not_stored(self):
+        body = SerializedBody.serialize([{'name': 'Pınar Tam Yağlı Süt 1 L'}])
+        view = cached_response('search')(body.respond)
+        factory = RequestFactory()
+        self.assertEqual(view(factory.get('/', headers={'Accept-Encoding': 'gzip'}))['Content-Encoding'], 'gzip')
+        response = view(factory.get('/'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class InvalidationTests(TestCase):
+    @override_settings(REDIS_URL='redis://127.0.0.1:1')
+    def test_unreachable_redis_does_not_fail_the_load(self):
+        with self.assertLogs('users.invalidation', 'ERROR'):
+            self.assertIsNone(invalidation.publish_catalog_changed())
+
+
+class PrefixIndexTests(SimpleTestCase):
+    completions = [
+        ('Pınar Süt 1 L', 39.95, 6),
+        ('Işık Ayçiçek Yağı 5 L', 249.9, 4),
+        ('İçim Süt Kreması 200 ml', 24.5, 3),
+        ('Sütaş Ayran 1 L', 32.0, 2),
+    ]
+
+    def complete(self, query, index=None):
+        index = index or autocomplete.PrefixIndex(self.completions)
+        return [name for name, _, _ in index.complete(query, 10)]
+
+    def test_word_prefixes_in_rank_order(self):
+        self.assertEqual(self.complete('süt'), ['Pınar Süt 1 L', 'İçim Süt Kreması 200 ml', 'Sütaş Ayran 1 L'])
+        self.assertEqual(self.complete('süt k'), ['İçim Süt Kreması 200 ml'])
+
+    def test_turkish_casefolding(self):
+        self.assertEqual(self.complete('IŞIK'), ['Işık Ayçiçek Yağı 5 L'])
+        self.assertEqual(self.complete('içim'), ['İçim Süt Kreması 200 ml'])
+        self.assertEqual(self.complete('isik'), [])
+
+    def test_precomputed_prefixes_match_scanned_ranges(self):
+        completions = [(f'Ürün {number}', number, 1) for number in range(autocomplete.SCAN_LIMIT * 3)]
+        index = autocomplete.PrefixIndex(completions)
+        self.assertIn('ürün', index.top)
+        self.assertNotIn('ürün 1', index.top)
+        for query in ('ürün', 'ürün 1'):
+            expected = [name for name, _, _ in completions if autocomplete.fold(name).startswith(query)][:10]
+            self.assertEqual(self.complete(query, index), expected)
+
+
+class QueryPoolViewTests(SimpleTestCase):
+    def view(self, request):
+        return HttpResponse(threading.current_thread().name)
+
+    def get(self):
+        return async_to_sync(query_pool_view(self.view))(RequestFactory().get('/')).content.decode()
+
+    @override_settings(CATALOG_QUERY_WORKERS=2)
+    def test_view_runs_on_query_pool(self):
+        self.assertTrue(self.get().startswith('catalog-query'))
+
+    @override_settings(CATALOG_QUERY_WORKERS=0)
+    def test_no_workers_runs_on_shared_thread(self):
+        self.assertEqual(self.get(), threading.current_thread().name)
+
+
+class LocalCacheTests(SimpleTestCase):
+    def test_concurrent_misses_are_computed_once(self):
+        cache = LocalCache()
+        calls, release = [], threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait()
+            return 'products'
+
+        outcomes = []
+        threads = [threading.Thread(target=lambda: outcomes.append(cache.get('key', 1, compute))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(outcome for outcome, _, _ in outcomes)[0], COMPUTED)
+        self.assertEqual({value for _, _, value in outcomes}, {'products'})
+
+    @override_settings(CATALOG_QUERY_WORKERS=1)
+    def test_stale_value_is_served_while_it_is_refreshed(self):
+        cache = LocalCache()
+        cache.get('key', 1, lambda: 'old')
+        release = threading.Event()
+
+        def compute():
+            release.wait()
+            return 'new'
+
+        self.assertEqual(cache.get('key', 2, compute), (STALE, 1, 'old'))
+        self.assertEqual(cache.get('key', 2, compute), (STALE, 1, 'old'))
+        release.set()
+        query_pool().submit(lambda: None).result()
+        self.assertEqual(cache.get('key', 2, compute), (HIT, 2, 'new'))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = LocalCache(max_bytes=10, sizeof=len)
+        cache.get('a', 1, lambda: 'aaaa')
+        cache.get('b', 1, lambda: 'bbbb')
+        cache.get('a', 1, lambda: 'aaaa')
+        cache.get('c', 1, lambda: 'cccc')
+        self.assertEqual(cache.get('a', 1, lambda: 'recomputed')[0], HIT)
+        self.assertEqual(cache.get('b', 1, lambda: 'recomputed'), (COMPUTED, 1, 'recomputed'))
+
+
+class MatchingTests(SimpleTestCase):
+    def test_normalize_folds_diacritics_and_sizes(self):
+        self.assertEqual(normalize('Pınar Pastörize Süt 1 L'), normalize('PINAR Pastorize Sut 1000 ml'))
+        self.assertEqual(normalize("Sırma Su 6'lı 1,5 L")[1], normalize('Sırma Su 9 L')[1])
+
+    def test_matches_one_product_per_market(self):
+        markets = ['migros', 'a101', 'migros', 'a101', 'sokmarket']
+        names = [
+            'Pınar Yağlı Süt 1 L', 'PINAR YAGLI SUT 1000 ML',
+            'Pınar Yarım Yağlı Süt 1 L', 'Pınar Yarım Yağlı Süt 1 Lt', 'Pınar Yağlı Süt 500 ml',
+        ]
+        _, groups = find_matches(markets, names, processes=1)
+        self.assertEqual(groups[0], groups[1])
+        self.assertEqual(groups[2], groups[3])
+        self.assertEqual(len({groups[0], groups[2], groups[4]}), 3)
+
+    def test_canonical_ids_carry_over(self):
+        new_ids = iter(range(100, 200))
+        ids = canonical_ids([1, 1, 2, 2, 3], [7, 7, 7, None, None], lambda count: [next(new_ids) for _ in range(count)])
+        self.assertEqual(ids, {1: 7, 2: 100, 3: 101})
@@ -0,0 +1,3 @@
+def turkish_casefold(text):
+    """Lower-cases text with Turkish dotted/dotless i rules (I -> ı, İ -> i)."""
+    return text.replace('I', 'ı').replace('İ', 'i').lower()
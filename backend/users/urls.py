@@ -32,6 +32,9 @@ from .views import (
     NearbyMarketsWithPricesAPIView
 )
 from . import views
+from .catalog_version import catalog_conditional
+from .concurrency import query_pool_view
+from .response_cache import cached_response
 
 
 
@@ -39,15 +42,18 @@ urlpatterns = [
     path('test/', test_view, name='test'),
     path('users/register/', UserRegistrationView.as_view(), name='register'),
     path('users/login/', user_login, name='login'),
-    path('products/', ProductListAPIView.as_view(), name='product-list'),
-    path('products/filtered/', HomePageProductListAPIView.as_view(), name='filtered-product-list'),
-    path('cheapest-products/', views.cheapest_products, name='cheapest-products'),
-    path('cheapest-products-per-category/', views.cheapest_products_per_category, name='cheapest-products-per-category'),
-    path('cheapest-products-by-categories/', views.cheapest_products_by_categories, name='cheapest-products-by-categories'),
-    path('search/', views.search_products, name='search_products'), # verilerin tablodan çekilebilmesi için eklediğim endpoint
+    path('products/', catalog_conditional(query_pool_view(cached_response('products')(ProductListAPIView.as_view()))), name='product-list'),
+    path('products/filtered/', catalog_conditional(query_pool_view(cached_response('filtered-products')(HomePageProductListAPIView.as_view()))), name='filtered-product-list'),
+    path('cheapest-products/', catalog_conditional(query_pool_view(views.cheapest_products)), name='cheapest-products'),
+    path('cheapest-products-per-category/', catalog_conditional(query_pool_view(cached_response('cheapest-products-per-category')(views.cheapest_products_per_category))), name='cheapest-products-per-category'),
+    path('cheapest-products-by-categories/', catalog_conditional(query_pool_view(views.cheapest_products_by_categories)), name='cheapest-products-by-categories'),
+    path('search/', catalog_conditional(query_pool_view(cached_response('search')(views.search_products))), name='search_products'), # verilerin tablodan çekilebilmesi için eklediğim endpoint
+    path('autocomplete/', views.autocomplete_products, name='autocomplete'),
+    path('basket/compare/', query_pool_view(views.compare_basket), name='compare-basket'),
     path('favorite-carts/', FavoriteCartListCreateView.as_view(), name='favorite-carts'),
-    path('markets-products/', MarketsListAPIView.as_view(), name='market-products'),
-    path('discounted-products/', DiscountedProductsAPIView.as_view(), name='discounted-products'),
+    path('markets-products/', query_pool_view(MarketsListAPIView.as_view()), name='market-products'),
+    path('discounted-products/', catalog_conditional(query_pool_view(DiscountedProductsAPIView.as_view())), name='discounted-products'),
+    path('deals/', catalog_conditional(query_pool_view(cached_response('deals')(views.discounted_products))), name='deals'),
     path('addresses/', UserAddressView.as_view(), name='user-addresses'),
     path('addresses/<int:address_id>/', UserAddressView.as_view(), name='delete-address'),
     path('change-password/', ChangePasswordView.as_view(), name='change-password'),
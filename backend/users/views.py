@@ -7,7 +7,7 @@ import traceback
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.models import User
 from django.db import transaction, connection
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from django.utils import timezone
@@ -18,7 +18,9 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
-from django.db.models import F
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
+from django.db.models import Sum
 from itertools import chain
 import requests
 from geopy.geocoders import Nominatim
@@ -26,16 +28,23 @@ from geopy.distance import geodesic
 from urllib.parse import quote
 
 from .models import (
-    FavoriteCart, FavoriteCartProduct, Product, A101Product, MopasProduct, MigrosProduct,
-    SokmarketProduct, MarketpaketiProduct, CarrefourProduct, UserAddress,
+    MARKETS, MARKET_DISPLAY_NAMES, CatalogProduct, Deal,
+    FavoriteCart, FavoriteCartProduct, UserAddress,
     UserPhoneNumber, ShoppingList, ShoppingListItem, Invitation
 )
 from .serializers import (
-    UserSerializer, FavoriteCartSerializer, ProductSerializer,
+    UserSerializer, FavoriteCartSerializer,
     UserAddressSerializer, ShoppingListSerializer, ShoppingListItemSerializer,
-    MopasProductSerializer, MigrosProductSerializer, A101ProductSerializer,SokmarketProductSerializer,
-    MarketpaketiProductSerializer, CarrefourProductSerializer
+    CatalogProductSerializer, DealSerializer
 )
+from . import homepage
+from .autocomplete import MAX_COMPLETIONS, get_index as get_autocomplete_index
+from .basket import BasketError, compare_basket as compare_basket_prices, parse_items
+from .catalog import cheapest_per_category
+from .categories import category_filter
+from .pagination import CatalogKeysetPagination, DealKeysetPagination, SearchPagination
+from .responses import PrecomputedResponse
+from .search import estimated_total, fuzzy_search, text_search
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -85,373 +94,221 @@ def user_login(request):
     
     return Response({'error': 'Invalid credentials'}, status=400)
 
+def _stream_catalog(products):
+    """Yields the catalog as JSON Lines, reading it through a server-side cursor in chunks."""
+    chunk_size = settings.CATALOG_STREAM_CHUNK_SIZE
+    fields = [field.attname for field in CatalogProduct._meta.fields if field.name not in ('id', 'search_vector', 'search_name')]
+    lines = []
+    for product in products.values(*fields).iterator(chunk_size=chunk_size):
+        # Same shape as CatalogProductSerializer: products are known by their market table id
+        product['id'] = product.pop('source_id')
+        product['market_name'] = MARKET_DISPLAY_NAMES.get(product['market'], product['market'])
+        lines.append(json.dumps(product, ensure_ascii=False, default=str))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
 class ProductListAPIView(APIView):
-    """Tüm ürünleri dönen bir API"""
+    """Tüm ürünleri sayfa sayfa dönen bir API (?stream=1 ile tüm katalog JSON Lines olarak akıtılır)"""
+    pagination_class = CatalogKeysetPagination
+
     def get(self, request):
+        if request.query_params.get('stream') == '1':
+            return StreamingHttpResponse(
+                _stream_catalog(CatalogProduct.objects.all()),
+                content_type='application/x-ndjson; charset=utf-8'
+            )
+
+        paginator = self.pagination_class()
         try:
-            # Get products from all market tables
-            mopas_products = MopasProduct.objects.all()
-            migros_products = MigrosProduct.objects.all()
-            sokmarket_products = SokmarketProduct.objects.all()
-            marketpaketi_products = MarketpaketiProduct.objects.all()
-            carrefour_products = CarrefourProduct.objects.all()
-            
-            # Combine products from different markets
-            combined_data = []
-            
-            combined_data.extend(MopasProductSerializer(mopas_products, many=True).data)
-            combined_data.extend(MigrosProductSerializer(migros_products, many=True).data)
-            combined_data.extend(SokmarketProductSerializer(sokmarket_products, many=True).data)
-            combined_data.extend(MarketpaketiProductSerializer(marketpaketi_products, many=True).data)
-            combined_data.extend(CarrefourProductSerializer(carrefour_products, many=True).data)
-            
-            return Response(combined_data, status=200)
+            # The search columns are not serialized, and search_vector is the widest column of a row
+            products = CatalogProduct.objects.defer('search_vector', 'search_name')
+            products = paginator.paginate_queryset(products, request, view=self)
+            return paginator.get_paginated_response(CatalogProductSerializer(products, many=True).data)
+        except NotFound as e:
+            return Response({'error': str(e.detail)}, status=404)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
 class HomePageProductListAPIView(APIView):
-    """Filtrelenmiş ürünleri dönen bir API"""
+    """Filtrelenmiş ürünleri sayfa sayfa dönen bir API (?category= normalize kategori ya da marketin kategorisi)"""
+    pagination_class = CatalogKeysetPagination
+
     def get(self, request):
         category = request.query_params.get('category', None)
         in_stock = request.query_params.get('in_stock', None)
 
+        paginator = self.pagination_class()
         try:
-            # Get filtered products from all market tables
-            mopas_products = MopasProduct.objects.all()
-            migros_products = MigrosProduct.objects.all()
-            sokmarket_products = SokmarketProduct.objects.all()
-            marketpaketi_products = MarketpaketiProduct.objects.all()
-            carrefour_products = CarrefourProduct.objects.all()
-            a101_products = A101Product.objects.all()
-            
-            # Apply filters to each market's products
+            products = CatalogProduct.objects.defer('search_vector', 'search_name')
             if category:
-                mopas_products = mopas_products.filter(main_category__icontains=category)
-                migros_products = migros_products.filter(main_category__icontains=category)
-                sokmarket_products = sokmarket_products.filter(main_category__icontains=category)
-                marketpaketi_products = marketpaketi_products.filter(main_category__icontains=category)
-                carrefour_products = carrefour_products.filter(main_category__icontains=category)
-                a101_products = a101_products.filter(main_category__icontains=category)
+                products = products.filter(category_filter(category))
             if in_stock is not None:
                 in_stock_value = in_stock.lower() == 'true'
-                mopas_products = mopas_products.filter(in_stock=in_stock_value)
-                migros_products = migros_products.filter(in_stock=in_stock_value)
-                sokmarket_products = sokmarket_products.filter(in_stock=in_stock_value)
-                marketpaketi_products = marketpaketi_products.filter(in_stock=in_stock_value)
-                carrefour_products = carrefour_products.filter(in_stock=in_stock_value)
-                a101_products = a101_products.filter(in_stock=in_stock_value)
-            # Combine products from different markets
-            combined_data = []
-            
-            combined_data.extend(MopasProductSerializer(mopas_products, many=True).data)
-            combined_data.extend(MigrosProductSerializer(migros_products, many=True).data)
-            combined_data.extend(SokmarketProductSerializer(sokmarket_products, many=True).data)
-            combined_data.extend(MarketpaketiProductSerializer(marketpaketi_products, many=True).data)
-            combined_data.extend(CarrefourProductSerializer(carrefour_products, many=True).data)
-            combined_data.extend(A101ProductSerializer(a101_products, many=True).data)
-            return Response(combined_data, status=200)
+                products = products.filter(in_stock=in_stock_value)
+            products = paginator.paginate_queryset(products, request, view=self)
+            return paginator.get_paginated_response(CatalogProductSerializer(products, many=True).data)
+        except NotFound as e:
+            return Response({'error': str(e.detail)}, status=404)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
 def cheapest_products(request):
-    """Her marketten en ucuz 4 ürünü döner."""
+    """Her marketten en ucuz 4 ürünü döner (son yüklemede hazırlanmış yanıttan)."""
     try:
-        # Products organized by market
-        market_products = {
-            "Mopas": [],
-            "Migros": [],
-            "Şok Market": [],
-            "Market Paketi": [],
-            "Carrefour": [],
-            "A101": []
-        }
-        
-        # Try to get products from each model, but continue if one fails
-        try:
-            for product in MopasProduct.objects.all():
-                try:
-                    # Only include products with valid price
-                    if product.price is not None:
-                        market_products["Mopas"].append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "market_name": "mopas"  # Add market name
-                        })
-                except Exception as e:
-                    print(f"Error processing MopasProduct: {e}")
-        except Exception as e:
-            print(f"Error querying MopasProduct: {e}")
-        try:
-            for product in A101Product.objects.all():
-                try:
-                    if product.price is not None:
-                        market_products["A101"].append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "market_name": "a101"  # Add market name
-                        })
-                except Exception as e:
-                    print(f"Error processing A101Product: {e}")
-        except Exception as e:
-            print(f"Error querying A101Product: {e}")
-        try:
-            for product in MigrosProduct.objects.all():
-                try:
-                    # Only include products with valid price
-                    if product.price is not None:
-                        market_products["Migros"].append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "market_name": "migros"  # Add market name
-                        })
-                except Exception as e:
-                    print(f"Error processing MigrosProduct: {e}")
-        except Exception as e:
-            print(f"Error querying MigrosProduct: {e}")
-        
-        try:
-            for product in SokmarketProduct.objects.all():
-                try:
-                    # Only include products with valid price
-                    if product.price is not None:
-                        market_products["Şok Market"].append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "market_name": "sokmarket"  # Add market name
-                        })
-                except Exception as e:
-                    print(f"Error processing SokmarketProduct: {e}")
-        except Exception as e:
-            print(f"Error querying SokmarketProduct: {e}")
-        
-        try:
-            for product in MarketpaketiProduct.objects.all():
-                try:
-                    # Only include products with valid price
-                    if product.price is not None:
-                        market_products["Market Paketi"].append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "market_name": "marketpaketi"  # Add market name
-                        })
-                except Exception as e:
-                    print(f"Error processing MarketpaketiProduct: {e}")
-        except Exception as e:
-            print(f"Error querying MarketpaketiProduct: {e}")
-        
-        try:
-            for product in CarrefourProduct.objects.all():
-                try:
-                    # Only include products with valid price
-                    if product.price is not None:
-                        market_products["Carrefour"].append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "market_name": "carrefour"  # Add market name
-                        })
-                except Exception as e:
-                    print(f"Error processing CarrefourProduct: {e}")
-        except Exception as e:
-            print(f"Error querying CarrefourProduct: {e}")
-        
-        cheapest_products = []
-        
-        for market, products in market_products.items():
-            if not products:
-                continue
-                
-            products.sort(key=lambda x: x["price"])
-            
-            cheapest_in_market = products[:4] if len(products) > 4 else products
-            
-         
-            cheapest_products.extend(cheapest_in_market)
-        
-        return JsonResponse(cheapest_products, safe=False)
+        return (
+            homepage.serve_snapshot('cheapest-products', request)
+            or JsonResponse(homepage.cheapest_products(), safe=False)
+        )
     except Exception as e:
         import traceback
         print(f"Error in cheapest_products: {e}")
         print(traceback.format_exc())
-        return JsonResponse([], safe=False)
+        # Not an empty list: a 200 would carry the catalog version's ETag
+        return JsonResponse({'error': str(e)}, status=500)
 
 def cheapest_products_per_category(request):
-    """Her marketten en ucuz 4 ürünü döner."""
+    """Her marketin her ana kategorisinden en ucuz k ürünü döner (?k=4, isteğe bağlı ?category=)."""
     try:
-        market_products = {
-            "Mopas": [],
-            "Migros": [],
-            "Şok Market": [],
-            "Market Paketi": [],
-            "Carrefour": [],
-            "A101": []
-        }
-        try:
-            for product in A101Product.objects.all():
-                try:
-                    if product.price is not None:
-                        market_products["A101"].append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "category": product.main_category,
-                            "market_name": "a101"
-                        })
-                except Exception as e:
-                    print(f"Error processing A101Product: {e}")
-        except Exception as e:  
-            print(f"Error querying A101Product: {e}")
-        try:
-            for product in MopasProduct.objects.all():
-                try:
-                    if product.price is not None:
-                        price = float(product.price) if isinstance(product.price, str) else product.price
-                        market_products["Mopas"].append({
-                            "name": product.name,
-                            "price": price,
-                            "image": product.image_url,
-                            "category": product.main_category,
-                            "market_name": "mopas"
-                        })
-                except Exception as e:
-                    print(f"Error processing MopasProduct: {e}")
-        except Exception as e:
-            print(f"Error querying MopasProduct: {e}")
-        
-        try:
-            for product in MigrosProduct.objects.all():
-                try:
-                    if product.price is not None:
-                        price = float(product.price) if isinstance(product.price, str) else product.price
-                        market_products["Migros"].append({
-                            "name": product.name,
-                            "price": price,
-                            "image": product.image_url,
-                            "category": product.main_category,
-                            "market_name": "migros"
-                        })
-                except Exception as e:
-                    print(f"Error processing MigrosProduct: {e}")
-        except Exception as e:
-            print(f"Error querying MigrosProduct: {e}")
-        
-        try:
-            for product in SokmarketProduct.objects.all():
-                try:
-                    if product.price is not None:
-                        price = float(product.price) if isinstance(product.price, str) else product.price
-                        market_products["Şok Market"].append({
-                            "name": product.name,
-                            "price": price,
-                            "image": product.image_url,
-                            "category": product.main_category,
-                            "market_name": "sokmarket"
-                        })
-                except Exception as e:
-                    print(f"Error processing SokmarketProduct: {e}")
-        except Exception as e:
-            print(f"Error querying SokmarketProduct: {e}")
-        
-        try:
-            for product in MarketpaketiProduct.objects.all():
-                try:
-                    if product.price is not None:
-                        price = float(product.price) if isinstance(product.price, str) else product.price
-                        market_products["Market Paketi"].append({
-                            "name": product.name,
-                            "price": price,
-                            "image": product.image_url,
-                            "category": product.main_category,
-                            "market_name": "marketpaketi"
-                        })
-                except Exception as e:
-                    print(f"Error processing MarketpaketiProduct: {e}")
-        except Exception as e:
-            print(f"Error querying MarketpaketiProduct: {e}")
-        
-        try:
-            for product in CarrefourProduct.objects.all():
-                try:
-                    if product.price is not None:
-                        market_products["Carrefour"].append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "category": product.main_category,
-                            "market_name": "carrefour"
-                        })
-                except Exception as e:
-                    print(f"Error processing CarrefourProduct: {e}")
-        except Exception as e:
-            print(f"Error querying CarrefourProduct: {e}")
-        
-        results = []
-        
-        for market, products in market_products.items():
-            if not products:
-                continue
-                
-            products.sort(key=lambda x: x["price"])
-            
-            cheapest_in_market = products[:4] if len(products) > 4 else products
-            
-            results.extend(cheapest_in_market)
-        
+        k = max(1, min(int(request.GET.get('k', 4)), 50))
+    except ValueError:
+        return JsonResponse({'error': 'k must be an integer'}, status=400)
+    category = request.GET.get('category')
+
+    try:
+        products = cheapest_per_category(['name', 'price', 'image_url'], k, main_category=category or None)
+
+        market_positions = {market: position for position, (market, _, _) in enumerate(MARKETS)}
+        results = [
+            {
+                "name": product['name'],
+                "price": product['price'],
+                "image": product['image_url'],
+                "category": product['main_category'],
+                "market_name": product['market']
+            }
+            for product in sorted(
+                products,
+                key=lambda x: (market_positions.get(x['market'], len(MARKETS)), x['main_category'] or '', x['price'])
+            )
+        ]
         return JsonResponse(results, safe=False)
     except Exception as e:
         import traceback
         print(f"Error in cheapest_products_per_category: {e}")
         print(traceback.format_exc())
-        return JsonResponse([], safe=False)    
+        # Not an empty list: a 200 would be cached as the catalog version's response
+        return JsonResponse({'error': str(e)}, status=500)
     
+@api_view(['GET'])
 def search_products(request):
-    """Ürün aramak için kullanılan endpoint"""
+    """Ürün aramak için kullanılan endpoint (?q=, ?limit=50, ?cursor=, ?sort=relevance|price|discount, ?mode=text|fuzzy)
+
+    mode=text tam metin araması yapar, sonuç yoksa yazım hatalarına ve
+    Türkçe karakter eksikliğine dayanıklı fuzzy aramaya geçer. Yanıt bir
+    sayfalık ürün listesidir; sonraki sayfa Link başlığında, ilk sayfada
+    tahmini toplam X-Estimated-Total başlığında döner.
+    """
     query = request.GET.get('q', '')
     
     if query:
+        try:
+            int(request.GET.get('limit', SearchPagination.default_page_size))
+        except ValueError:
+            return JsonResponse({'error': 'limit must be an integer'}, status=400)
+        mode = request.GET.get('mode', 'text')
+        if mode not in ('text', 'fuzzy'):
+            return JsonResponse({'error': 'mode must be text or fuzzy'}, status=400)
+        sort = request.GET.get('sort', 'relevance')
+        if sort not in SearchPagination.SORTS:
+            return JsonResponse({'error': f"sort must be one of {', '.join(SearchPagination.SORTS)}"}, status=400)
+
+        paginator = SearchPagination(sort)
+        fields = ('source_id', 'name', 'price', 'high_price', 'in_stock', 'image_url', 'market', 'product_link')
+
+        def search(matches):
+            if sort == 'discount':
+                matches = matches.with_discount_ratio()
+            # Only the requested page (plus one row) is read from the ranked matches
+            return matches, paginator.paginate_queryset(matches.values(*fields, *paginator.ordering), request)
+
         results = []
-        
-        for table_name, model, market_name in [
-            ('mopas_3_products', MopasProduct, "mopas"),
-            ('migros_3_products', MigrosProduct, "migros"),
-            ('sokmarket_3_products', SokmarketProduct, "sokmarket"),
-            ('marketpaketi_3_products', MarketpaketiProduct, "marketpaketi"),
-            ('carrefour_3_products', CarrefourProduct, "carrefour"),
-            ('a101_3_products', A101Product, "a101")
-        ]:
-            try:
-                matching_products = model.objects.filter(name__icontains=query)
-                
-                for product in matching_products:
-                    try:
-                        results.append({
-                            'id': product.id,
-                            'name': product.name,
-                            'price': product.price,
-                            'high_price': product.high_price,
-                            'in_stock': product.in_stock,
-                            'image_url': product.image_url,
-                            'market_name': market_name,
-                            'product_link': product.product_link,
-                        })
-                    except Exception as e:
-                        print(f"Error processing search result from {table_name}: {e}")
-            except Exception as e:
-                print(f"Error searching in {table_name}: {e}")
+        headers = {}
+        try:
+            matches, page = [], []
+            if mode == 'text':
+                matches, page = search(text_search(query))
+            if not page:
+                matches, page = search(fuzzy_search(query))
+                mode = 'fuzzy'
+            for product in page:
+                results.append({
+                    'id': product['source_id'],
+                    'name': product['name'],
+                    'price': product['price'],
+                    'high_price': product['high_price'],
+                    'in_stock': product['in_stock'],
+                    'image_url': product['image_url'],
+                    'market_name': product['market'],
+                    'product_link': product['product_link'],
+                })
+            next_link = paginator.get_next_link()
+            if next_link:
+                # Later pages continue in the mode that produced this one
+                headers['Link'] = f'<{replace_query_param(next_link, "mode", mode)}>; rel="next"'
+            if results and paginator.cursor_query_param not in request.GET:
+                headers['X-Estimated-Total'] = str(estimated_total(matches))
+        except NotFound as e:
+            return JsonResponse({'error': str(e.detail)}, status=404)
+        except Exception as e:
+            print(f"Error searching in catalog: {e}")
 
         if results:
-            return JsonResponse(results, safe=False)
+            return JsonResponse(results, safe=False, headers=headers)
         else:
             return JsonResponse({'error': 'No results found'}, status=404)
     else:
         return JsonResponse({'error': 'No search query provided'}, status=400)
     
 
+def autocomplete_products(request):
+    """Yazarken ürün adı tamamlama endpoint'i (?q=, ?limit=10); veritabanına gitmez, bellekteki indeksi kullanır"""
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), MAX_COMPLETIONS))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+
+    try:
+        completions = get_autocomplete_index().complete(request.GET.get('q', ''), limit)
+        return JsonResponse(
+            [{'name': name, 'price': price, 'product_count': count} for name, price, count in completions],
+            safe=False,
+            json_dumps_params={'ensure_ascii': False}
+        )
+    except Exception as e:
+        print(f"Error in autocomplete_products: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@api_view(['POST'])
+def compare_basket(request):
+    """Sepeti her markette fiyatlayan endpoint: {"items": [{"name" ya da "canonical_product_id", "quantity"}]}
+
+    Her market için toplam fiyatı, bulunan ürünleri ve sepetin eksiksiz
+    olup olmadığını döner; tüm kataloğu indirmeye gerek kalmaz.
+    """
+    try:
+        items = parse_items(request.data.get('items') if isinstance(request.data, dict) else None)
+    except BasketError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        return JsonResponse(compare_basket_prices(items), safe=False, json_dumps_params={'ensure_ascii': False})
+    except Exception as e:
+        print(f"Error in compare_basket: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
 
 class FavoriteCartListCreateView(generics.ListCreateAPIView):
     serializer_class = FavoriteCartSerializer
@@ -528,245 +385,58 @@ class DeleteFavoriteCartView(generics.DestroyAPIView):
                 "error": str(e)
             }, status=status.HTTP_400_BAD_REQUEST, json_dumps_params={'ensure_ascii': False})
 
-class MarketsListAPIView(APIView):
-    def get(self, request):
-        try:
-            markets_data = {
-                "Mopas": [],
-                "Migros": [],
-                "Şok Market": [],
-                "Market Paketi": [],
-                "Carrefour": [],
-                "A101": []
-            }
-            
-            mopas_products = MopasProduct.objects.all()
-            for product in mopas_products:
-                markets_data["Mopas"].append({
-                    "name": product.name,
-                    "price": product.price,
-                    "image": product.image_url,
-                    "category": product.main_category
-                })
-                
-            migros_products = MigrosProduct.objects.all()
-            for product in migros_products:
-                markets_data["Migros"].append({
-                    "name": product.name,
-                    "price": product.price,
-                    "image": product.image_url,
-                    "category": product.main_category
-                })
-                
-            sokmarket_products = SokmarketProduct.objects.all()
-            for product in sokmarket_products:
-                markets_data["Şok Market"].append({
-                    "name": product.name,
-                    "price": product.price,
-                    "image": product.image_url,
-                    "category": product.main_category
-                })
-                
-            marketpaketi_products = MarketpaketiProduct.objects.all()
-            for product in marketpaketi_products:
-                markets_data["Market Paketi"].append({
-                    "name": product.name,
-                    "price": product.price,
-                    "image": product.image_url,
-                    "category": product.main_category
-                })
+def _markets_products():
+    """Every market's products, grouped by market; built once per catalog load by MarketsListAPIView."""
+    markets_data = {display_name: [] for _, display_name, _ in MARKETS}
+
+    products = CatalogProduct.objects.values('market', 'name', 'price', 'image_url', 'main_category')
+    for product in products.iterator(chunk_size=settings.CATALOG_STREAM_CHUNK_SIZE):
+        markets_data[MARKET_DISPLAY_NAMES[product['market']]].append({
+            "name": product['name'],
+            "price": product['price'],
+            "image": product['image_url'],
+            "category": product['main_category']
+        })
 
-            a101_products = A101Product.objects.all()
-            for product in a101_products:
-                markets_data["A101"].append({
-                    "name": product.name,
-                    "price": product.price,
-                    "image": product.image_url,
-                })
-            carrefour_products = CarrefourProduct.objects.all()
-            for product in carrefour_products:
-                markets_data["Carrefour"].append({
-                    "name": product.name,
-                    "price": product.price,
-                    "image": product.image_url,
-                    "category": product.main_category
-                })
+    return [
+        {
+            "marketName": market,
+            "products": market_products,
+        }
+        for market, market_products in markets_data.items()
+        if market_products
+    ]
 
-            response_data = [
-                {
-                    "marketName": market,
-                    "products": market_products,
-                }
-                for market, market_products in markets_data.items()
-                if market_products 
-            ]
+markets_products_response = PrecomputedResponse('markets-products', _markets_products)
 
-            return JsonResponse(response_data, safe=False)
+class MarketsListAPIView(APIView):
+    """Tüm marketlerin ürünlerini dönen API; yanıt her katalog yüklemesinde bir kez hazırlanıp sıkıştırılır, tekrar isteklere ETag ile 304 döner"""
+    def get(self, request):
+        try:
+            return markets_products_response.respond(request)
         except Exception as e:
             print(f"Error in MarketsListAPIView: {e}")
             return JsonResponse({'error': str(e)}, status=500)
         
 from django.http import JsonResponse
-from django.db.models import F
 from rest_framework.views import APIView
 
 class DiscountedProductsAPIView(APIView):
-    """İndirimde olan ürünleri dönen bir API"""
+    """İndirimde olan ürünleri indirim oranına göre dönen bir API (?limit=50; varsayılan istek son yüklemede hazırlanır)"""
     def get(self, request):
         try:
-            normalized_categories = {
-                "fruits_vegetables": "Meyve ve Sebze",  # All fruit & vegetable variations
-                "beverages": "İçecekler",  # All beverage variations
-                "meat_poultry_fish": "Et, Tavuk ve Balık",  # All meat variations
-                "basic_food": "Temel Gıda",  # All basic food variations
-                "frozen_food": "Dondurulmuş Gıda"  # All frozen food variations
-            }
-            
-            # Define mapping from market-specific categories to normalized categories
-            category_mapping = {
-                # Migros categories
-                "Meyve, Sebze": "fruits_vegetables",
-                "İçecek": "beverages",
-                "Et, Tavuk, Balık": "meat_poultry_fish",
-                "Temel Gıda": "basic_food",
-                "Dondurulmuş Gıda": "frozen_food",
-                
-                # Şok Market categories
-                "Meyve & Sebze": "fruits_vegetables",
-                "İçecek": "beverages",
-                "Et & Tavuk & Şarküteri": "meat_poultry_fish",
-                "Yemeklik Malzemeler": "basic_food",
-                "Dondurulmuş Ürünler": "frozen_food",
-                
-                # Mopas categories
-                "Sebze & Meyve": "fruits_vegetables",
-                "İçecekler": "beverages",
-                "Kırmızı/Beyaz Et": "meat_poultry_fish",
-                "Gıda & Şekerleme": "basic_food",
-                
-                # Market Paketi categories (all GIDA for now)
-                "GIDA": "basic_food",
-                
-                # Carrefour categories
-                "Meyve, Sebze": "fruits_vegetables",
-                "İçecekler": "beverages",
-                "Et, Tavuk, Balık": "meat_poultry_fish",
-                "Temel Gıda": "basic_food",
-                "Hazır Yemek&Donuk Ürünler": "frozen_food"
-            }
-            
-            # Define market-specific categories
-            market_categories = {
-                "Migros": [
-                    "Meyve, Sebze",
-                    "İçecek",
-                    "Et, Tavuk, Balık",
-                    "Temel Gıda",
-                    "Dondurulmuş Gıda"
-                ],
-                "Şok Market": [
-                    "Meyve & Sebze",
-                    "İçecek",
-                    "Et & Tavuk & Şarküteri",
-                    "Yemeklik Malzemeler",
-                    "Dondurulmuş Ürünler"
-                ],
-                "Mopas": [
-                    "Sebze & Meyve",
-                    "İçecekler",
-                    "Kırmızı/Beyaz Et",
-                    "Gıda & Şekerleme"
-                ],
-                "Market Paketi": [
-                    "GIDA"
-                ],
-                "Carrefour": [
-                    "Meyve, Sebze",
-                    "İçecekler",
-                    "Et, Tavuk, Balık",
-                    "Temel Gıda",
-                    "Hazır Yemek&Donuk Ürünler"
-                ],
-                "A101": [
-                    
-                    "İçecek",
-                    "Et, Balık, Tavuk",
-                    "Temel Gıda",
-                    "Dondurulmuş Ürünler"
-                ]
-            }
-            
-            # Final list of discounted products
-            all_discounted_products = []
-            
-            # Maximum number of discounted products to show per market per category
-            max_products_per_market_category = 4
-            
-            # Process each market
-            markets = ["Mopas", "Migros", "Şok Market", "Market Paketi", "Carrefour"]
-            market_model_mapping = {
-                "Mopas": (MopasProduct, MopasProductSerializer),
-                "Migros": (MigrosProduct, MigrosProductSerializer),
-                "Şok Market": (SokmarketProduct, SokmarketProductSerializer),
-                "Market Paketi": (MarketpaketiProduct, MarketpaketiProductSerializer),
-                "Carrefour": (CarrefourProduct, CarrefourProductSerializer),
-                "A101": (A101Product, A101ProductSerializer)
-            }
-            
-            for market_name in markets:
-                try:
-                    model_class, serializer_class = market_model_mapping[market_name]
-                    
-                    # Get all discounted products from this market
-                    market_discounted = model_class.objects.filter(
-                        high_price__isnull=False,
-                        price__lt=F('high_price')
-                    ).order_by('price')
-                    
-                    # Process each product
-                    for product in market_discounted:
-                        # Skip products with no price
-                        if product.price is None:
-                            continue
-                            
-                        # Get normalized category if available
-                        category = product.main_category
-                        normalized_category = None
-                        if category in category_mapping:
-                            normalized_key = category_mapping[category]
-                            normalized_category = normalized_categories[normalized_key]
-                        
-                        # Calculate discount percentage
-                        discount_percentage = round(((product.high_price - product.price) / product.high_price) * 100) if product.high_price else 0
-                        
-                        # Format the product data
-                        product_data = serializer_class(product).data
-                        
-                        # Add additional fields needed by frontend
-                        product_data['market_name'] = market_name
-                        product_data['discount_percentage'] = discount_percentage
-                        product_data['image'] = product_data.get('image_url')  # Ensure image field exists
-                        
-                        # For category display in frontend
-                        if normalized_category:
-                            product_data['category'] = normalized_category
-                        else:
-                            product_data['category'] = category if category else "Genel"
-                            
-                        # Add to results
-                        all_discounted_products.append(product_data)
-                except Exception as e:
-                    print(f"Error processing {market_name} discounted products: {e}")
-            
-            # Sort all products by discount percentage (highest first)
-            all_discounted_products.sort(key=lambda x: x.get('discount_percentage', 0), reverse=True)
-            
-            # Limit to reasonable number (e.g., top 50 discounted products)
-            all_discounted_products = all_discounted_products[:50]
-            
+            limit = max(1, min(int(request.query_params.get('limit', homepage.DISCOUNTED_PRODUCTS_LIMIT)), 200))
+        except ValueError:
+            return JsonResponse({'error': 'limit must be an integer'}, status=400)
+
+        try:
+            if limit == homepage.DISCOUNTED_PRODUCTS_LIMIT:
+                response = homepage.serve_snapshot('discounted-products', request)
+                if response:
+                    return response
             # Türkçe karakter desteği
             return JsonResponse(
-                all_discounted_products,
+                homepage.discounted_products(limit),
                 safe=False,
                 json_dumps_params={'ensure_ascii': False}
             )
@@ -777,386 +447,35 @@ class DiscountedProductsAPIView(APIView):
             return JsonResponse({'error': str(e)}, status=500)
 
 def cheapest_products_by_categories(request):
-    """Her marketten belirli 5 kategoriden en ucuz ürünleri döner."""
+    """Her marketten normalize kategorilerdeki en ucuz ürünleri döner (son yüklemede hazırlanmış yanıttan)."""
     try:
-        # Define normalized category names
-        normalized_categories = {
-            "fruits_vegetables": "Meyve ve Sebze",  # All fruit & vegetable variations
-            "beverages": "İçecekler",  # All beverage variations
-            "meat_poultry_fish": "Et, Tavuk ve Balık",  # All meat variations
-            "basic_food": "Temel Gıda",  # All basic food variations
-            "frozen_food": "Dondurulmuş Gıda"  # All frozen food variations
-        }
-        
-        # Define mapping from market-specific categories to normalized categories
-        category_mapping = {
-            # Migros categories
-            "Meyve, Sebze": "fruits_vegetables",
-            "İçecek": "beverages",
-            "Et, Tavuk, Balık": "meat_poultry_fish",
-            "Temel Gıda": "basic_food",
-            "Dondurulmuş Gıda": "frozen_food",
-            
-            # Şok Market categories
-            "Meyve & Sebze": "fruits_vegetables",
-            "İçecek": "beverages",
-            "Et & Tavuk & Şarküteri": "meat_poultry_fish",
-            "Yemeklik Malzemeler": "basic_food",
-            "Dondurulmuş Ürünler": "frozen_food",
-            
-            # A101 categories
-            "Et, Balık, Tavuk": "meat_poultry_fish",
-            "Temel Gıda": "basic_food",
-            "Dondurulmuş Ürünler": "frozen_food",
-            "İçecek": "beverages",
-            
-            # Mopas categories
-            "Sebze & Meyve": "fruits_vegetables",
-            "İçecekler": "beverages",
-            "Kırmızı/Beyaz Et": "meat_poultry_fish",
-            "Gıda & Şekerleme": "basic_food",
-            
-            # Market Paketi categories (all GIDA for now)
-            "GIDA": "basic_food",
-            
-            # Carrefour categories
-            "Meyve, Sebze": "fruits_vegetables",
-            "İçecekler": "beverages",
-            "Et, Tavuk, Balık": "meat_poultry_fish",
-            "Temel Gıda": "basic_food",
-            "Hazır Yemek&Donuk Ürünler": "frozen_food"
-        }
-        
-        # Define specific categories for each market
-        market_categories = {
-            "Migros": [
-                "Meyve, Sebze",
-                "İçecek",
-                "Et, Tavuk, Balık",
-                "Temel Gıda",
-                "Dondurulmuş Gıda"
-            ],
-            "Şok Market": [
-                "Meyve & Sebze",
-                "İçecek",
-                "Et & Tavuk & Şarküteri",
-                "Yemeklik Malzemeler",
-                "Dondurulmuş Ürünler"
-            ],
-            "Mopas": [
-                "Sebze & Meyve",
-                "İçecekler",
-                "Kırmızı/Beyaz Et",
-                "Gıda & Şekerleme",
-                "Gıda & Şekerleme"
-            ],
-            "Market Paketi": [
-                "GIDA",
-                "GIDA",
-                "GIDA",
-                "GIDA",
-                "GIDA"
-            ],
-            "Carrefour": [
-                "Meyve, Sebze",
-                "İçecekler",
-                "Et, Tavuk, Balık",
-                "Temel Gıda",
-                "Hazır Yemek&Donuk Ürünler"
-            ],
-            "A101": [
-                "Et, Balık, Tavuk",
-                "Temel Gıda",
-                "Dondurulmuş Ürünler",
-                "İçecek"
-            ]
-        }
-        
-        # Products organized by market and category
-        results = []
-        
-        # Process each market separately
-        
-        # A101
-        try:
-            a101_categories = market_categories["A101"]
-            for category in a101_categories:
-                category_products = list(A101Product.objects.filter(main_category=category))    
-                if category_products:
-                    category_products.sort(key=lambda x: x.price if x.price is not None else float('inf'))
-                    cheapest_products = category_products[:4] if len(category_products) >= 4 else category_products
-                    normalized_category = normalized_categories[category_mapping[category]]
-                    for product in cheapest_products:
-                        results.append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "category": normalized_category,
-                            "original_category": category,
-                            "market_name": "a101"
-                        })  
-        except Exception as e:
-            print(f"Error processing A101 categories: {e}")
-        
-        # Migros
-        try:
-            migros_categories = market_categories["Migros"]
-            for category in migros_categories:
-                # Get products in this category
-                category_products = list(MigrosProduct.objects.filter(main_category=category))
-                
-                if category_products:
-                    # Sort by price
-                    category_products.sort(key=lambda x: x.price if x.price is not None else float('inf'))
-                    
-                    # Take up to 4 cheapest products from this category
-                    cheapest_products = category_products[:4] if len(category_products) >= 4 else category_products
-                    
-                    # Get normalized category
-                    normalized_category = normalized_categories[category_mapping[category]]
-                    
-                    # Add each of the cheapest products
-                    for product in cheapest_products:
-                        results.append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "category": normalized_category,
-                            "original_category": category,
-                            "market_name": "migros"
-                        })
-        except Exception as e:
-            print(f"Error processing Migros categories: {e}")
-        
-        # Şok Market
-        try:
-            sok_categories = market_categories["Şok Market"]
-            for category in sok_categories:
-                # Get products in this category
-                category_products = list(SokmarketProduct.objects.filter(main_category=category))
-                
-                if category_products:
-                    # Sort by price
-                    category_products.sort(key=lambda x: x.price if x.price is not None else float('inf'))
-                    
-                    # Take up to 4 cheapest products from this category
-                    cheapest_products = category_products[:4] if len(category_products) >= 4 else category_products
-                    
-                    # Get normalized category
-                    normalized_category = normalized_categories[category_mapping[category]]
-                    
-                    # Add each of the cheapest products
-                    for product in cheapest_products:
-                        results.append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "category": normalized_category,
-                            "original_category": category,
-                            "market_name": "sokmarket"
-                        })
-        except Exception as e:
-            print(f"Error processing Şok Market categories: {e}")
-        
-        # Mopas
-        try:
-            mopas_categories = market_categories["Mopas"]
-            for category in mopas_categories:
-                # Get products in this category
-                category_products = list(MopasProduct.objects.filter(main_category=category))
-                
-                if category_products:
-                    # Sort by price
-                    category_products.sort(key=lambda x: x.price if x.price is not None else float('inf'))
-                    
-                    # Take up to 4 cheapest products from this category
-                    cheapest_products = category_products[:4] if len(category_products) >= 4 else category_products
-                    
-                    # Get normalized category
-                    normalized_category = normalized_categories[category_mapping[category]]
-                    
-                    # Add each of the cheapest products
-                    for product in cheapest_products:
-                        results.append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "category": normalized_category,
-                            "original_category": category,
-                            "market_name": "mopas"
-                        })
-        except Exception as e:
-            print(f"Error processing Mopas categories: {e}")
-        
-        # Market Paketi
-        try:
-            marketpaketi_categories = market_categories["Market Paketi"]
-            for category in marketpaketi_categories:
-                # Get products in this category
-                category_products = list(MarketpaketiProduct.objects.filter(main_category=category))
-                
-                if category_products:
-                    # Sort by price
-                    category_products.sort(key=lambda x: x.price if x.price is not None else float('inf'))
-                    
-                    # Take up to 4 cheapest products from this category
-                    cheapest_products = category_products[:4] if len(category_products) >= 4 else category_products
-                    
-                    # Get normalized category
-                    normalized_category = normalized_categories[category_mapping[category]]
-                    
-                    # Add each of the cheapest products
-                    for product in cheapest_products:
-                        results.append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "category": normalized_category,
-                            "original_category": category,
-                            "market_name": "marketpaketi"
-                        })
-        except Exception as e:
-            print(f"Error processing Market Paketi categories: {e}")
-        
-        # Carrefour
-        try:
-            carrefour_categories = market_categories["Carrefour"]
-            for category in carrefour_categories:
-                # Get products in this category
-                category_products = list(CarrefourProduct.objects.filter(main_category=category))
-                
-                if category_products:
-                    # Sort by price
-                    category_products.sort(key=lambda x: x.price if x.price is not None else float('inf'))
-                    
-                    # Take up to 4 cheapest products from this category
-                    cheapest_products = category_products[:4] if len(category_products) >= 4 else category_products
-                    
-                    # Get normalized category
-                    normalized_category = normalized_categories[category_mapping[category]]
-                    
-                    # Add each of the cheapest products
-                    for product in cheapest_products:
-                        results.append({
-                            "name": product.name,
-                            "price": product.price,
-                            "image": product.image_url,
-                            "category": normalized_category,
-                            "original_category": category,
-                            "market_name": "carrefour"
-                        })
-        except Exception as e:
-            print(f"Error processing Carrefour categories: {e}")
-        
-        return JsonResponse(results, safe=False)
+        return (
+            homepage.serve_snapshot('cheapest-products-by-categories', request)
+            or JsonResponse(homepage.cheapest_products_by_categories(), safe=False)
+        )
     except Exception as e:
         import traceback
         print(f"Error in cheapest_products_by_categories: {e}")
         print(traceback.format_exc())
-        # Return an empty list instead of an error to prevent the frontend from breaking
-        return JsonResponse([], safe=False)    
+        # Not an empty list: a 200 would carry the catalog version's ETag
+        return JsonResponse({'error': str(e)}, status=500)
 
 @api_view(['GET'])
 def discounted_products(request):
-    """Fetch products that have a high_price greater than their current price"""
+    """İndirimli ürünleri önceden hesaplanmış deals tablosundan sayfa sayfa döner (?category=, ?market=)"""
+    paginator = DealKeysetPagination()
     try:
-        # Get products from all market tables that have discounts
-        discounted_products = []
-
-        # A101 products with discounts
-        a101_products = A101Product.objects.filter(high_price__gt=F('price')).exclude(high_price__isnull=True)
-        discounted_products.extend([{
-            'id': str(product.id),
-            'name': product.name,
-            'price': product.price,
-            'image_url': product.image_url,
-            'main_category': product.main_category,
-            'sub_category': product.sub_category,
-            'lowest_category': product.lowest_category,
-            'market_name': 'a101',
-            'high_price': product.high_price,
-            'product_link': product.product_link
-        } for product in a101_products])
-
-        # Mopas products with discounts
-        mopas_products = MopasProduct.objects.filter(high_price__gt=F('price')).exclude(high_price__isnull=True)
-        discounted_products.extend([{
-            'id': str(product.id),
-            'name': product.name,
-            'price': product.price,
-            'image_url': product.image_url,
-            'main_category': product.main_category,
-            'sub_category': product.sub_category,
-            'lowest_category': product.lowest_category,
-            'market_name': 'mopas',
-            'high_price': product.high_price,
-            'product_link': product.product_link
-        } for product in mopas_products])
-
-        # Migros products with discounts
-        migros_products = MigrosProduct.objects.filter(high_price__gt=F('price')).exclude(high_price__isnull=True)
-        discounted_products.extend([{
-            'id': str(product.id),
-            'name': product.name,
-            'price': product.price,
-            'image_url': product.image_url,
-            'main_category': product.main_category,
-            'sub_category': product.sub_category,
-            'lowest_category': product.lowest_category,
-            'market_name': 'migros',
-            'high_price': product.high_price,
-            'product_link': product.product_link
-        } for product in migros_products])
-
-        # Sokmarket products with discounts
-        sokmarket_products = SokmarketProduct.objects.filter(high_price__gt=F('price')).exclude(high_price__isnull=True)
-        discounted_products.extend([{
-            'id': str(product.id),
-            'name': product.name,
-            'price': product.price,
-            'image_url': product.image_url,
-            'main_category': product.main_category,
-            'sub_category': product.sub_category,
-            'lowest_category': product.lowest_category,
-            'market_name': 'sokmarket',
-            'high_price': product.high_price,
-            'product_link': product.product_link
-        } for product in sokmarket_products])
-
-        # Marketpaketi products with discounts
-        marketpaketi_products = MarketpaketiProduct.objects.filter(high_price__gt=F('price')).exclude(high_price__isnull=True)
-        discounted_products.extend([{
-            'id': str(product.id),
-            'name': product.name,
-            'price': product.price,
-            'image_url': product.image_url,
-            'main_category': product.main_category,
-            'sub_category': product.sub_category,
-            'lowest_category': product.lowest_category,
-            'market_name': 'marketpaketi',
-            'high_price': product.high_price,
-            'product_link': product.product_link
-        } for product in marketpaketi_products])
-
-        # Carrefour products with discounts
-        carrefour_products = CarrefourProduct.objects.filter(high_price__gt=F('price')).exclude(high_price__isnull=True)
-        discounted_products.extend([{
-            'id': str(product.id),
-            'name': product.name,
-            'price': product.price,
-            'image_url': product.image_url,
-            'main_category': product.main_category,
-            'sub_category': product.sub_category,
-            'lowest_category': product.lowest_category,
-            'market_name': 'carrefour',
-            'high_price': product.high_price,
-            'product_link': product.product_link
-        } for product in carrefour_products])
-
-        # Sort products by discount percentage (highest discount first)
-        discounted_products.sort(key=lambda x: (x['high_price'] - x['price']) / x['high_price'], reverse=True)
-
-        return JsonResponse(discounted_products, safe=False)
+        deals = Deal.objects.all()
+        category = request.query_params.get('category')
+        if category:
+            deals = deals.filter(category=category)
+        market = request.query_params.get('market')
+        if market:
+            deals = deals.filter(market=market)
+        deals = paginator.paginate_queryset(deals, request)
+        return paginator.get_paginated_response(DealSerializer(deals, many=True).data)
+    except NotFound as e:
+        return JsonResponse({'error': str(e.detail)}, status=404)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)    
     
@@ -1768,18 +1087,13 @@ class NearbyMarketsWithPricesAPIView(APIView):
             longitude = float(request.query_params.get('longitude', 0))
             radius = int(request.query_params.get('radius', 6500)) 
 
-            market_products = {
-                "mopas": MopasProduct.objects.all(),
-                "migros": MigrosProduct.objects.all(),
-                "sokmarket": SokmarketProduct.objects.all(),
-                "marketpaketi": MarketpaketiProduct.objects.all(),
-                "carrefour": CarrefourProduct.objects.all()
-            }
-
-            market_prices = {}
-            for market_name, products in market_products.items():
-                total_price = sum(product.price for product in products if product.price is not None)
-                market_prices[market_name] = total_price
+            market_prices = dict(
+                CatalogProduct.objects.priced()
+                .exclude(market='a101')
+                .values('market')
+                .annotate(total_price=Sum('price'))
+                .values_list('market', 'total_price')
+            )
 
             overpass_query = f"""
             [out:json];